@@ -7,11 +7,14 @@ def main():
     parser = argparse.ArgumentParser(description='Run Movie Recommendation System Components')
     parser.add_argument('--download', action='store_true', help='Download the dataset')
     parser.add_argument('--train', action='store_true', help='Train and save the models')
+    parser.add_argument('--precompute', action='store_true', help='Precompute recommendations for all users')
     parser.add_argument('--evaluate', action='store_true', help='Evaluate model performance')
     parser.add_argument('--visualize', action='store_true', help='Create visualizations')
+    parser.add_argument('--benchmark', action='store_true', help='Benchmark model fitting and recommendation latency')
     parser.add_argument('--web', action='store_true', help='Start web interface')
     parser.add_argument('--all', action='store_true', help='Run all components')
     parser.add_argument('--port', type=int, default=8080, help='Port for web interface')
+    parser.add_argument('--workers', type=int, default=None, help='Serve the web interface from N pre-forked worker processes')
     parser.add_argument('--setup', action='store_true', help='Set up project directory structure')
     parser.add_argument('--clean', action='store_true', help='Clean temporary files')
     
@@ -39,10 +42,18 @@ def main():
         print("Training and saving models...")
         subprocess.run([sys.executable, "-m", "scripts.train"])
     
+    if args.precompute or args.all:
+        print("Precomputing recommendations...")
+        subprocess.run([sys.executable, "-m", "scripts.precompute"])
+    
     if args.evaluate or args.all:
         print("Evaluating models...")
         subprocess.run([sys.executable, "-m", "scripts.evaluate"])
     
+    if args.benchmark:
+        print("Running benchmarks...")
+        subprocess.run([sys.executable, "-m", "scripts.benchmark"])
+    
     if args.visualize or args.all:
         print("Creating visualizations...")
         try:
@@ -59,7 +70,8 @@ def main():
     
     if args.web or args.all:
         print("Starting web interface...")
-        if not os.path.exists('models/cf_model.pkl') or not os.path.exists('models/hybrid_model.pkl'):
+        from src.recommender.persistence import bundle_exists
+        if not bundle_exists():
             print("Models not found. Training models first...")
             subprocess.run([sys.executable, "-m", "scripts.train"])
         
@@ -68,10 +80,14 @@ def main():
             port = args.port
             print(f"Starting web interface on port {port}...")
             
-            # Set environment variable for Flask to use the specified port
-            os.environ['FLASK_RUN_PORT'] = str(port)
-            
-            subprocess.run([sys.executable, "-m", "web.app"])
+            if args.workers:
+                # Production mode: models are loaded once and shared by forked workers
+                subprocess.run([sys.executable, "-m", "web.server", "--port", str(port), "--workers", str(args.workers)])
+            else:
+                # Set environment variable for Flask to use the specified port
+                os.environ['FLASK_RUN_PORT'] = str(port)
+                
+                subprocess.run([sys.executable, "-m", "web.app"])
         except KeyboardInterrupt:
             print("Web interface stopped.")
 
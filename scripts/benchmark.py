@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.recommender.data import load_data, prepare_data, get_movie_features
+from src.recommender.models import CollaborativeFiltering, MatrixFactorization, ContentBasedFiltering, HybridRecommender
+from src.recommender.neighbours import IVFNeighbours
+
+DEFAULT_OUTPUT = 'benchmarks/results.json'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def timed(function, *args, **kwargs):
+    """Call function and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_stats(function, queries, warmup=5):
+    """Call function once per query and summarise the latencies in milliseconds."""
+    for query in queries[:warmup]:
+        function(query)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies = np.array(latencies)
+    return {
+        'queries': len(latencies),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99))
+    }
+
+
+def throughput(function, user_ids, batch_size):
+    """Score user_ids in batches and return users per second."""
+    start = time.perf_counter()
+    for offset in range(0, len(user_ids), batch_size):
+        function(user_ids[offset:offset + batch_size])
+    elapsed = time.perf_counter() - start
+    return {'users': len(user_ids), 'batch_size': batch_size, 'seconds': elapsed,
+            'users_per_second': len(user_ids) / elapsed if elapsed else None}
+
+
+def subsample_users(ratings, fraction, seed):
+    """Keep the ratings of a seeded random fraction of users."""
+    if fraction >= 1:
+        return ratings
+    user_ids = np.unique(ratings['userId'].values)
+    rng = np.random.default_rng(seed)
+    keep = rng.choice(user_ids, max(1, int(len(user_ids) * fraction)), replace=False)
+    return ratings[np.isin(ratings['userId'].values, keep)]
+
+
+def neighbour_search(cf_model, query_rows, probes, n_lists, seed):
+    """
+    Compare approximate IVF neighbour search with the exact search, for
+    each number of probed lists: recall@k of the neighbour sets and
+    single-query latency.
+    """
+    k = cf_model.k
+    queries = [cf_model.user_vectors[[row]] for row in query_rows]
+    exact = cf_model.neighbour_index
+    exact_neighbours, _ = exact.search(cf_model.user_vectors[query_rows], k, query_rows)
+    results = {'k': k, 'exact': latency_stats(lambda i: exact.search(queries[i], k, [query_rows[i]]), range(len(queries)))}
+    
+    index, fit_seconds = timed(IVFNeighbours(n_lists=n_lists, seed=seed).fit, cf_model.user_vectors)
+    results['ivf'] = {'n_lists': index.centroids_t.shape[1], 'fit_s': fit_seconds, 'probes': []}
+    for n_probe in probes:
+        probed = index.with_n_probe(n_probe)
+        neighbours, _ = probed.search(cf_model.user_vectors[query_rows], k, query_rows)
+        found = [len(np.intersect1d(a, b)) for a, b in zip(neighbours, exact_neighbours)]
+        stats = latency_stats(lambda i: probed.search(queries[i], k, [query_rows[i]]), range(len(queries)))
+        results['ivf']['probes'].append({
+            'n_probe': n_probe,
+            'recall_at_k': float(np.mean(found) / exact_neighbours.shape[1]),
+            **stats
+        })
+    return results
+
+
+def benchmark_size(ratings, movies, fraction, n_queries, batch_size, n_recommendations, seed,
+                   probes=(1, 4, 16), n_lists=None):
+    """Run the suite on one dataset size and return its results."""
+    rng = np.random.default_rng(seed)
+    ratings = subsample_users(ratings, fraction, seed)
+    result = {'fraction': fraction, 'ratings': len(ratings), 'users': int(ratings['userId'].nunique()),
+              'movies': int(ratings['movieId'].nunique()), 'timings': {}}
+    timings = result['timings']
+
+    (user_item_matrix, train_data, test_data), timings['prepare_data_s'] = timed(prepare_data, ratings)
+    movie_features, timings['movie_features_s'] = timed(get_movie_features, movies)
+
+    cf_model, timings['cf_fit_s'] = timed(CollaborativeFiltering(k=20).fit, user_item_matrix)
+    graph_model, timings['cf_graph_fit_s'] = timed(
+        CollaborativeFiltering(k=20, precompute_neighbours=True).fit, user_item_matrix
+    )
+    mf_model, timings['mf_fit_s'] = timed(MatrixFactorization().fit, user_item_matrix)
+    cb_model, timings['content_fit_s'] = timed(ContentBasedFiltering().fit, movie_features, movies)
+    hybrid_model, timings['hybrid_fit_s'] = timed(
+        HybridRecommender().fit, user_item_matrix, movie_features, movies, train_data
+    )
+
+    user_ids = cf_model.user_index.ids
+    query_users = rng.choice(user_ids, min(n_queries, len(user_ids)), replace=False).tolist()
+    query_movies = rng.choice(cb_model.movie_ids, min(n_queries, len(cb_model.movie_ids)), replace=False).tolist()
+    # Fold-in queries replay the query users' training ratings as sessions
+    user_ratings = train_data.groupby('userId')
+    query_sessions = [
+        list(zip(*(user_ratings.get_group(u)[column].tolist() for column in ('movieId', 'rating'))))
+        for u in query_users
+    ]
+
+    result['latency'] = {
+        'cf_recommend_items': latency_stats(lambda u: cf_model.recommend_items(u, n_recommendations), query_users),
+        'cf_graph_recommend_items': latency_stats(
+            lambda u: graph_model.recommend_items(u, n_recommendations), query_users
+        ),
+        'mf_recommend_items': latency_stats(lambda u: mf_model.recommend_items(u, n_recommendations), query_users),
+        'hybrid_recommend_items': latency_stats(lambda u: hybrid_model.recommend_items(u, n_recommendations), query_users),
+        'cf_recommend_for_ratings': latency_stats(
+            lambda r: cf_model.recommend_for_ratings(r, n_recommendations), query_sessions
+        ),
+        'mf_recommend_for_ratings': latency_stats(
+            lambda r: mf_model.recommend_for_ratings(r, n_recommendations), query_sessions
+        ),
+        'hybrid_recommend_for_ratings': latency_stats(
+            lambda r: hybrid_model.recommend_for_ratings(r, n_recommendations), query_sessions
+        ),
+        'content_recommend_similar_movies': latency_stats(
+            lambda m: cb_model.recommend_similar_movies(m, n_recommendations), query_movies
+        )
+    }
+    result['throughput'] = {
+        'cf_recommend_items_batch': throughput(
+            lambda users: cf_model.recommend_items_batch(users, n_recommendations), user_ids, batch_size
+        ),
+        'mf_recommend_items_batch': throughput(
+            lambda users: mf_model.recommend_items_batch(users, n_recommendations), user_ids, batch_size
+        ),
+        'hybrid_recommend_items_batch': throughput(
+            lambda users: hybrid_model.recommend_items_batch(users, n_recommendations), user_ids, batch_size
+        )
+    }
+    result['neighbour_search'] = neighbour_search(
+        cf_model, cf_model.user_index.positions(query_users), probes, n_lists, seed
+    )
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark model fitting and recommendation latency')
+    parser.add_argument('--data-path', default='data/ml-latest-small', help='MovieLens dataset directory')
+    parser.add_argument('--sizes', default='0.25,0.5,1.0', help='Comma-separated fractions of users to benchmark on')
+    parser.add_argument('--queries', type=int, default=200, help='Single-user queries per latency measurement')
+    parser.add_argument('--batch-size', type=int, default=1024, help='Users per batch for throughput')
+    parser.add_argument('--n', type=int, default=10, help='Recommendations per query')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for user sampling')
+    parser.add_argument('--probes', default='1,4,16', help='Comma-separated IVF lists to probe per query')
+    parser.add_argument('--n-lists', type=int, default=None, help='IVF lists (default: sqrt of the number of users)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file to write results to')
+    args = parser.parse_args()
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': vars(args),
+        'timings': {},
+        'sizes': []
+    }
+
+    (ratings, movies), results['timings']['load_data_s'] = timed(load_data, args.data_path)
+
+    for fraction in [float(size) for size in args.sizes.split(',')]:
+        print(f"Benchmarking on {fraction:.0%} of users...")
+        result = benchmark_size(ratings, movies, fraction, args.queries, args.batch_size, args.n, args.seed,
+                                [int(probe) for probe in args.probes.split(',')], args.n_lists)
+        results['sizes'].append(result)
+
+        latency = result['latency']
+        print(f"  fit: cf {result['timings']['cf_fit_s']:.3f}s, "
+              f"cf with neighbour graph {result['timings']['cf_graph_fit_s']:.3f}s, "
+              f"matrix factorization {result['timings']['mf_fit_s']:.3f}s, "
+              f"content {result['timings']['content_fit_s']:.3f}s, "
+              f"hybrid {result['timings']['hybrid_fit_s']:.3f}s")
+        for name, stats in latency.items():
+            print(f"  {name}: p50 {stats['p50_ms']:.2f}ms, p95 {stats['p95_ms']:.2f}ms, p99 {stats['p99_ms']:.2f}ms")
+        for name, stats in result['throughput'].items():
+            print(f"  {name}: {stats['users_per_second']:.0f} users/s")
+        search = result['neighbour_search']
+        print(f"  exact neighbour search: p50 {search['exact']['p50_ms']:.2f}ms")
+        for stats in search['ivf']['probes']:
+            print(f"  ivf neighbour search ({stats['n_probe']}/{search['ivf']['n_lists']} lists): "
+                  f"recall@{search['k']} {stats['recall_at_k']:.3f}, p50 {stats['p50_ms']:.2f}ms")
+
+    results['peak_rss_mb'] = peak_rss_mb()
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    print(f"Benchmark results saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
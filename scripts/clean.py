@@ -47,8 +47,8 @@ env/
 .idea/
 .vscode/
 
-# Model files (too large for GitHub)
-models/*.pkl
+# Model bundles (too large for GitHub)
+/models/
 
 # Generated files
 *.png
@@ -67,7 +67,7 @@ models/*.pkl
         os.makedirs('models')
     
     print("\nRemoveing large files from Git history...")
-    run_command('git rm --cached models/*.pkl')
+    run_command('git rm -r --cached models')
     run_command('git commit -m "Remove large model files from Git"')
     
     print("\nYou can now try pushing to GitHub again using:")
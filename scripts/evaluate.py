@@ -4,8 +4,11 @@ import sys
 try:
     import pandas as pd
     from src.recommender.data import load_data, prepare_data, get_movie_features
-    from src.recommender.models import CollaborativeFiltering, ContentBasedFiltering, HybridRecommender
+    from src.recommender.models import (
+        CollaborativeFiltering, ItemBasedCF, MatrixFactorization, ContentBasedFiltering, HybridRecommender
+    )
     from src.recommender.evaluation import evaluate_recommendations
+    from src.recommender.metrics import REGISTRY, span
 except ImportError as e:
     print(f"Error importing dependencies: {e}")
     print("Please install required dependencies with:")
@@ -30,18 +33,31 @@ def main():
     print("Preparing recommender models...")
     # Initialize models
     cf_model = CollaborativeFiltering(k=10)
+    item_model = ItemBasedCF(k=20)
+    mf_model = MatrixFactorization(factors=32)
     cb_model = ContentBasedFiltering()
     hybrid_model = HybridRecommender(cf_weight=0.7)
     
     # Train models
     print("\nTraining collaborative filtering model...")
-    cf_model.fit(user_item_matrix)
+    with span('fit', model='cf'):
+        cf_model.fit(user_item_matrix)
+    
+    print("Training item-based collaborative filtering model...")
+    with span('fit', model='item'):
+        item_model.fit(user_item_matrix)
+    
+    print("Training matrix factorization model...")
+    with span('fit', model='mf'):
+        mf_model.fit(user_item_matrix)
     
     print("Training content-based filtering model...")
-    cb_model.fit(movie_features, movies)
+    with span('fit', model='content'):
+        cb_model.fit(movie_features, movies)
     
     print("Training hybrid recommendation model...")
-    hybrid_model.fit(user_item_matrix, movie_features, movies, train_data)
+    with span('fit', model='hybrid'):
+        hybrid_model.fit(user_item_matrix, movie_features, movies, train_data)
     
     # Example recommendations
     print("\n--- Example Recommendations ---")
@@ -84,10 +100,23 @@ def main():
     # Evaluate models
     print("\n--- Model Evaluation ---")
     print("Evaluating collaborative filtering model...")
-    cf_precision, cf_recall, cf_hit_rate = evaluate_recommendations(cf_model, test_data, movies, k=10)
+    with span('evaluate', model='cf'):
+        cf_precision, cf_recall, cf_hit_rate = evaluate_recommendations(cf_model, test_data, movies, k=10)
+    
+    print("\nEvaluating item-based collaborative filtering model...")
+    with span('evaluate', model='item'):
+        item_precision, item_recall, item_hit_rate = evaluate_recommendations(item_model, test_data, movies, k=10)
+    
+    print("\nEvaluating matrix factorization model...")
+    with span('evaluate', model='mf'):
+        mf_precision, mf_recall, mf_hit_rate = evaluate_recommendations(mf_model, test_data, movies, k=10)
     
     print("\nEvaluating hybrid recommendation model...")
-    hybrid_precision, hybrid_recall, hybrid_hit_rate = evaluate_recommendations(hybrid_model, test_data, movies, k=10)
+    with span('evaluate', model='hybrid'):
+        hybrid_precision, hybrid_recall, hybrid_hit_rate = evaluate_recommendations(hybrid_model, test_data, movies, k=10)
+    
+    print("\n--- Timings ---")
+    print(REGISTRY.summary())
     
     # Store metrics for visualization
     try:
@@ -99,6 +128,8 @@ def main():
         
         metrics_dict = {
             'Collaborative': (cf_precision, cf_recall, cf_hit_rate),
+            'Item-based': (item_precision, item_recall, item_hit_rate),
+            'Matrix factorization': (mf_precision, mf_recall, mf_hit_rate),
             'Hybrid': (hybrid_precision, hybrid_recall, hybrid_hit_rate)
         }
         plot_model_comparison(metrics_dict)
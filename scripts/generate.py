@@ -0,0 +1,23 @@
+import argparse
+from src.recommender.synthetic import generate_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic MovieLens-format dataset for scale testing')
+    parser.add_argument('--ratings', type=int, default=1_000_000, help='Approximate number of ratings')
+    parser.add_argument('--users', type=int, default=None, help='Number of users (default: MovieLens proportions)')
+    parser.add_argument('--movies', type=int, default=None, help='Number of movies (default: MovieLens proportions)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help='Ratings generated per chunk')
+    parser.add_argument('--output', default=None, help='Output directory (default: data/synthetic-<ratings>)')
+    args = parser.parse_args()
+    
+    output = args.output or f'data/synthetic-{args.ratings}'
+    print(f"Generating synthetic dataset in '{output}'...")
+    written = generate_dataset(
+        output, n_ratings=args.ratings, n_users=args.users, n_movies=args.movies,
+        seed=args.seed, chunk_size=args.chunk_size
+    )
+    print(f"Generated {written:,} ratings. Use it with load_data('{output}')")
+
+if __name__ == "__main__":
+    main()
@@ -20,7 +20,8 @@ def main():
     
     # Train and save models if needed
     print("\n3. Checking model availability...")
-    if not os.path.exists('models/cf_model.pkl') or not os.path.exists('models/hybrid_model.pkl'):
+    from src.recommender.persistence import bundle_exists
+    if not bundle_exists():
         print("   Models not found. Training models...")
         subprocess.run([sys.executable, "-m", "scripts.train"])
     else:
@@ -0,0 +1,36 @@
+import argparse
+from src.recommender.persistence import load_bundle, bundle_exists, DEFAULT_BUNDLE_PATH
+from src.recommender.precompute import (
+    precompute_recommendations, save_precomputed, DEFAULT_PRECOMPUTED_PATH
+)
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute top-N recommendations for all known users')
+    parser.add_argument('--n', type=int, default=10, help='Number of recommendations stored per user')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--block-size', type=int, default=1024, help='Users scored per batch')
+    args = parser.parse_args()
+    
+    print("Precomputing recommendations...")
+    if not bundle_exists(DEFAULT_BUNDLE_PATH):
+        print("Model files don't exist. Please run 'python -m scripts.train' first")
+        return
+    
+    models, manifest = load_bundle(DEFAULT_BUNDLE_PATH)
+    
+    # Every user known to the collaborative filtering model gets a row
+    user_ids = models['cf'].user_index.ids
+    
+    results = precompute_recommendations(
+        {'cf': models['cf'], 'hybrid': models['hybrid']},
+        user_ids,
+        n_recommendations=args.n,
+        block_size=args.block_size,
+        n_jobs=args.jobs
+    )
+    save_precomputed(results, user_ids, manifest['model_version'], DEFAULT_PRECOMPUTED_PATH)
+    
+    print(f"Precomputed recommendations saved to '{DEFAULT_PRECOMPUTED_PATH}'")
+
+if __name__ == "__main__":
+    main()
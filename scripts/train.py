@@ -1,52 +1,71 @@
-import pickle
+import argparse
 import os
-from src.recommender.data import load_data, prepare_data, get_movie_features
+from src.recommender.data import load_data, load_movies, prepare_data, get_movie_features, stream_interactions
 from src.recommender.models import CollaborativeFiltering, HybridRecommender
 from src.recommender.tuning import tune_collaborative_filtering, tune_hybrid_weights
+from src.recommender.persistence import save_bundle, DEFAULT_BUNDLE_PATH
 
-def main():
-    print("Training and saving recommendation models...")
-    
-    # Load data
-    ratings, movies = load_data()
-    
-    # Prepare data
-    user_item_matrix, train_data, test_data = prepare_data(ratings)
-    movie_features = get_movie_features(movies)
-    
-    # Create models directory if it doesn't exist
-    if not os.path.exists('models'):
-        os.makedirs('models')
-    
-    # Optional: Find optimal parameters
+def tune_parameters(user_item_matrix, movie_features, train_data, test_data, movies):
+    """Tune the CF neighbourhood size and hybrid weight, falling back to defaults on error."""
     print("Finding optimal parameters...")
     try:
         best_k = tune_collaborative_filtering(user_item_matrix, train_data, test_data, movies)
         best_weight = tune_hybrid_weights(user_item_matrix, movie_features, train_data, test_data, movies)
         
         # Convert best_k to an integer to avoid sklearn error
-        best_k = int(best_k)
+        return int(best_k), best_weight
     except Exception as e:
         print(f"Error tuning parameters: {e}")
-        best_k = 20
-        best_weight = 0.7
+        return 20, 0.7
+
+def main():
+    parser = argparse.ArgumentParser(description='Train and save the recommendation models')
+    parser.add_argument('--data-path', default='data/ml-latest-small', help='MovieLens dataset directory')
+    parser.add_argument('--stream', action='store_true',
+                        help='Build the rating matrix from ratings.csv chunk by chunk and train on all ratings '
+                             'with default parameters, for datasets too large to load whole (e.g. ml-25m)')
+    args = parser.parse_args()
+    
+    print("Training and saving recommendation models...")
+    
+    # Create models directory if it doesn't exist
+    if not os.path.exists('models'):
+        os.makedirs('models')
+    
+    if args.stream:
+        # Nothing is held out, so parameters are not tuned; item popularity
+        # comes from the rating matrix
+        user_item_matrix = stream_interactions(os.path.join(args.data_path, 'ratings.csv'))
+        movies = load_movies(args.data_path)
+        movie_features = get_movie_features(movies)
+        train_data = None
+        best_k, best_weight = 20, 0.7
+    else:
+        ratings, movies = load_data(args.data_path)
+        user_item_matrix, train_data, test_data = prepare_data(ratings)
+        movie_features = get_movie_features(movies)
+        best_k, best_weight = tune_parameters(user_item_matrix, movie_features, train_data, test_data, movies)
     
     # Train models with optimal parameters
     print(f"Training final models with k={best_k}, cf_weight={best_weight}...")
-    cf_model = CollaborativeFiltering(k=best_k)
+    # Both CF models answer known users from a neighbour graph built at fit time
+    cf_model = CollaborativeFiltering(k=best_k, precompute_neighbours=True)
     cf_model.fit(user_item_matrix)
     
-    hybrid_model = HybridRecommender(cf_weight=best_weight)
+    hybrid_model = HybridRecommender(
+        cf_weight=best_weight, cf_model=CollaborativeFiltering(k=20, precompute_neighbours=True)
+    )
     hybrid_model.fit(user_item_matrix, movie_features, movies, train_data)
     
-    # Save models
-    with open('models/cf_model.pkl', 'wb') as f:
-        pickle.dump(cf_model, f)
-        
-    with open('models/hybrid_model.pkl', 'wb') as f:
-        pickle.dump(hybrid_model, f)
+    # Save models as a memory-mappable bundle
+    # The content model is the hybrid's component and is stored only once
+    manifest = save_bundle({
+        'cf': cf_model,
+        'content': hybrid_model.cb_model,
+        'hybrid': hybrid_model
+    }, DEFAULT_BUNDLE_PATH)
     
-    print("Models saved to 'models' directory")
+    print(f"Models saved to '{DEFAULT_BUNDLE_PATH}' (version {manifest['model_version']})")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,31 @@
+import argparse
+import time
+from src.recommender.data import read_csv_cached, RATINGS_DTYPES
+from src.recommender.persistence import load_bundle, save_bundle, bundle_exists, DEFAULT_BUNDLE_PATH
+
+def main():
+    parser = argparse.ArgumentParser(description='Fold new ratings into the saved models without retraining')
+    parser.add_argument('ratings', help='CSV file of new ratings with userId, movieId and rating columns')
+    args = parser.parse_args()
+
+    if not bundle_exists(DEFAULT_BUNDLE_PATH):
+        print("Model files don't exist. Please run 'python -m scripts.train' first")
+        return
+
+    models, manifest = load_bundle(DEFAULT_BUNDLE_PATH)
+    new_ratings = read_csv_cached(args.ratings, RATINGS_DTYPES)
+    print(f"Updating models from version {manifest['model_version']} with {len(new_ratings)} ratings...")
+
+    start = time.time()
+    changes = models['cf'].update(new_ratings)
+    models['hybrid'].update(new_ratings)
+    print(f"Applied {len(changes)} rating changes "
+          f"({changes['previous'].isna().sum()} new, {changes['previous'].notna().sum()} replaced) "
+          f"in {time.time() - start:.2f}s")
+
+    manifest = save_bundle(models, DEFAULT_BUNDLE_PATH)
+    print(f"Models saved to '{DEFAULT_BUNDLE_PATH}' (version {manifest['model_version']})")
+    print("Run 'python run.py --precompute' to refresh precomputed recommendations")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,385 @@
 import pandas as pd
 import numpy as np
 import os
-from sklearn.model_selection import train_test_split
+import json
+import shutil
+import uuid
+from scipy.sparse import coo_matrix, csr_matrix
 from src.recommender.utils import download_movielens_dataset
 
 
+class IdIndex:
+    """
+    Mapping between raw IDs (userId, movieId) and contiguous int32 positions.
+    """
+    
+    def __init__(self, ids):
+        """Initialize from the raw ID stored at each position."""
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self._sorter = np.argsort(self.ids, kind='stable').astype(np.int32)
+        self._sorted_ids = self.ids[self._sorter]
+        self._lookup = None
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __contains__(self, raw_id):
+        return self.get(raw_id) >= 0
+    
+    def get(self, raw_id, default=-1):
+        """Return the position of a single raw ID, or default if unknown."""
+        # Single lookups go through a hash table, built on first use
+        if self._lookup is None:
+            self._lookup = dict(zip(self.ids.tolist(), range(len(self.ids))))
+        return self._lookup.get(raw_id, default)
+    
+    def positions(self, raw_ids):
+        """Return the positions of an array of raw IDs, with -1 for unknown IDs."""
+        raw_ids = np.asarray(raw_ids)
+        if len(self.ids) == 0:
+            return np.full(raw_ids.shape, -1, dtype=np.int32)
+        
+        found = np.searchsorted(self._sorted_ids, raw_ids)
+        found = np.minimum(found, len(self.ids) - 1)
+        matches = self._sorted_ids[found] == raw_ids
+        return np.where(matches, self._sorter[found], -1).astype(np.int32)
+
+
+class InteractionMatrix:
+    """
+    Sparse user-item rating matrix with compact ID maps.
+    
+    matrix is a float32 CSR matrix whose rows are users and columns items;
+    users and items map raw userId/movieId values to rows and columns.
+    """
+    
+    def __init__(self, matrix, user_ids, item_ids):
+        """Initialize from a sparse matrix and the raw IDs of its rows and columns."""
+        self.matrix = csr_matrix(matrix, dtype=np.float32)
+        self.matrix.sum_duplicates()
+        self.matrix.sort_indices()
+        self.users = IdIndex(user_ids)
+        self.items = IdIndex(item_ids)
+        self._item_matrix = None
+    
+    @property
+    def item_matrix(self):
+        """The same ratings as a CSC matrix for item-side access, built on first use."""
+        if self._item_matrix is None:
+            self._item_matrix = self.matrix.tocsc()
+        return self._item_matrix
+    
+    @property
+    def shape(self):
+        return self.matrix.shape
+    
+    @property
+    def nnz(self):
+        return self.matrix.nnz
+    
+    @classmethod
+    def from_ratings(cls, ratings):
+        """
+        Build the matrix from a ratings DataFrame with userId, movieId and rating columns.
+        """
+        user_ids, rows = np.unique(ratings['userId'].values, return_inverse=True)
+        item_ids, columns = np.unique(ratings['movieId'].values, return_inverse=True)
+        
+        matrix = coo_matrix(
+            (ratings['rating'].values.astype(np.float32), (rows, columns)),
+            shape=(len(user_ids), len(item_ids))
+        )
+        
+        return cls(matrix, user_ids, item_ids)
+    
+    @classmethod
+    def from_frame(cls, user_item_frame):
+        """Build the matrix from a dense pivoted DataFrame (users as index, movies as columns)."""
+        return cls(csr_matrix(user_item_frame.values), user_item_frame.index.values, user_item_frame.columns.values)
+    
+    def to_frame(self):
+        """Return the matrix as a dense DataFrame. Only practical for small datasets."""
+        return pd.DataFrame(self.matrix.toarray(), index=self.users.ids, columns=self.items.ids)
+    
+    def with_ratings(self, ratings):
+        """
+        Return a new matrix with ratings added from a DataFrame with userId,
+        movieId and rating columns.
+        
+        A rating for a (user, movie) pair that is already present replaces
+        it; within ratings the last one wins. Unseen users and movies are
+        appended as new rows and columns, so existing positions are kept.
+        The current arrays are never modified, so memory-mapped read-only
+        matrices can be updated.
+        
+        Returns (matrix, changes), where changes has one row per updated
+        pair with userId, movieId, rating, previous (NaN for new pairs), and
+        the row and column positions.
+        """
+        raw_users = ratings['userId'].values
+        raw_items = ratings['movieId'].values
+        values = ratings['rating'].values.astype(np.float32)
+        
+        # Append unseen IDs after the existing ones
+        new_users = np.setdiff1d(np.unique(raw_users), self.users.ids)
+        new_items = np.setdiff1d(np.unique(raw_items), self.items.ids)
+        users = IdIndex(np.concatenate([self.users.ids, new_users]))
+        items = IdIndex(np.concatenate([self.items.ids, new_items]))
+        n_columns = len(items)
+        rows = users.positions(raw_users)
+        columns = items.positions(raw_items)
+        
+        # Keep the last rating given for each pair, ordered by (row, column)
+        keys = rows.astype(np.int64) * n_columns + columns
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - last
+        rows, columns, values, keys = rows[keep], columns[keep], values[keep], keys[keep]
+        
+        # Find the pairs that already have a rating; existing keys are sorted
+        # because CSR rows are in order with sorted column indices
+        old = self.matrix
+        old_rows = np.repeat(np.arange(old.shape[0], dtype=np.int64), np.diff(old.indptr))
+        old_keys = old_rows * n_columns + old.indices
+        found = np.minimum(np.searchsorted(old_keys, keys), max(len(old_keys) - 1, 0))
+        replaced = (old_keys[found] == keys) if len(old_keys) else np.zeros(len(keys), dtype=bool)
+        
+        kept = np.ones(len(old_keys), dtype=bool)
+        kept[found[replaced]] = False
+        matrix = coo_matrix(
+            (
+                np.concatenate([old.data[kept], values]),
+                (np.concatenate([old_rows[kept], rows]), np.concatenate([old.indices[kept], columns]))
+            ),
+            shape=(len(users), n_columns)
+        )
+        
+        changes = pd.DataFrame({
+            'userId': users.ids[rows],
+            'movieId': items.ids[columns],
+            'rating': values,
+            'previous': np.where(replaced, old.data[found] if len(old_keys) else 0, np.nan),
+            'row': rows,
+            'column': columns
+        })
+        
+        return InteractionMatrix(matrix, users.ids, items.ids), changes
+
+
+class _IdAssigner:
+    """Assigns compact codes to raw IDs in order of first appearance, chunk by chunk."""
+    
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int32)
+        self._sorted_ids = np.empty(0, dtype=np.int32)
+        self._sorted_codes = np.empty(0, dtype=np.int32)
+    
+    def assign(self, raw_ids):
+        """Return the codes of raw_ids, giving new codes to IDs not seen before."""
+        unique_ids, first = np.unique(raw_ids, return_index=True)
+        found = np.searchsorted(self._sorted_ids, unique_ids)
+        known = found < len(self._sorted_ids)
+        known[known] = self._sorted_ids[found[known]] == unique_ids[known]
+        
+        # New IDs get the next codes, in the order they appear in the chunk
+        new_ids = unique_ids[~known][np.argsort(first[~known], kind='stable')]
+        if len(new_ids):
+            new_codes = np.arange(len(self.ids), len(self.ids) + len(new_ids), dtype=np.int32)
+            self.ids = np.concatenate([self.ids, new_ids.astype(np.int32)])
+            order = np.argsort(np.concatenate([self._sorted_ids, new_ids]), kind='stable')
+            self._sorted_ids = np.concatenate([self._sorted_ids, new_ids])[order].astype(np.int32)
+            self._sorted_codes = np.concatenate([self._sorted_codes, new_codes])[order]
+        
+        return self._sorted_codes[np.searchsorted(self._sorted_ids, raw_ids)]
+
+
+def _read_rating_chunks(ratings_path, chunk_size):
+    return pd.read_csv(
+        ratings_path, usecols=['userId', 'movieId', 'rating'],
+        dtype={column: RATINGS_DTYPES[column] for column in ('userId', 'movieId', 'rating')},
+        chunksize=chunk_size
+    )
+
+
+def stream_interactions(ratings_path, chunk_size=250_000, build_item_matrix=True, verbose=True):
+    """
+    Build an InteractionMatrix from a ratings CSV without loading it whole.
+    
+    The file is read twice, chunk_size rows at a time. The first pass only
+    assigns user and item codes and counts each user's ratings, so the CSR
+    arrays can be allocated once at their final size with users and items
+    already ordered by raw ID, as in InteractionMatrix.from_ratings. The
+    second pass scatters each chunk straight into its final rows. Besides
+    the CSR arrays only one chunk is held at a time, and no DataFrame of the
+    whole file, intermediate COO matrix or reordering copy is built.
+    build_item_matrix also builds the CSC copy for item-side access. Used by
+    scripts/train.py --stream.
+    """
+    users = _IdAssigner()
+    items = _IdAssigner()
+    row_counts = np.zeros(0, dtype=np.int64)
+    n_read = 0
+    
+    for chunk in _read_rating_chunks(ratings_path, chunk_size):
+        rows = users.assign(chunk['userId'].values)
+        items.assign(chunk['movieId'].values)
+        
+        counts = np.bincount(rows, minlength=len(users.ids))
+        counts[:len(row_counts)] += row_counts
+        row_counts = counts
+        
+        n_read += len(chunk)
+        if verbose:
+            print(f"Counted {n_read:,} ratings ({len(users.ids):,} users, {len(items.ids):,} movies)")
+    
+    # Renumber users and items so that both are ordered by raw ID
+    user_order = np.argsort(users.ids, kind='stable')
+    user_rank = np.empty(len(users.ids), dtype=np.int32)
+    user_rank[user_order] = np.arange(len(users.ids), dtype=np.int32)
+    item_rank = np.empty(len(items.ids), dtype=np.int32)
+    item_rank[np.argsort(items.ids, kind='stable')] = np.arange(len(items.ids), dtype=np.int32)
+    
+    # Allocate the CSR arrays once and scatter each chunk into its rows
+    indptr = np.zeros(len(users.ids) + 1, dtype=np.int64)
+    np.cumsum(row_counts[user_order], out=indptr[1:])
+    indices = np.empty(n_read, dtype=np.int32)
+    data = np.empty(n_read, dtype=np.float32)
+    filled = indptr[:-1].copy()
+    n_filled = 0
+    
+    for chunk in _read_rating_chunks(ratings_path, chunk_size):
+        rows = user_rank[users.assign(chunk['userId'].values)]
+        order = np.argsort(rows, kind='stable')
+        rows = rows[order]
+        
+        # Rank of each rating among the chunk's ratings for the same user
+        starts = np.r_[0, np.flatnonzero(rows[1:] != rows[:-1]) + 1]
+        ranks = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        destination = filled[rows] + ranks
+        
+        indices[destination] = item_rank[items.assign(chunk['movieId'].values)][order]
+        data[destination] = chunk['rating'].values[order]
+        filled += np.bincount(rows, minlength=len(filled))
+        
+        n_filled += len(chunk)
+        if verbose:
+            print(f"Filled {n_filled:,} of {n_read:,} ratings")
+    
+    if n_filled != n_read or len(users.ids) != len(user_rank) or len(items.ids) != len(item_rank):
+        raise ValueError(f"{ratings_path} changed while it was being read")
+    
+    matrix = csr_matrix((data, indices, indptr), shape=(len(users.ids), len(items.ids)), copy=False)
+    matrix.sort_indices()
+    interactions = InteractionMatrix(matrix, users.ids[user_order], np.sort(items.ids))
+    if build_item_matrix:
+        interactions.item_matrix  # Build the CSC copy now rather than on first use
+    
+    if verbose:
+        print(f"Built {interactions.shape[0]:,} x {interactions.shape[1]:,} matrix with {interactions.nnz:,} ratings")
+    
+    return interactions
+
+
+def as_interaction_matrix(user_item_matrix):
+    """Accept either an InteractionMatrix or a dense pivoted DataFrame."""
+    if isinstance(user_item_matrix, InteractionMatrix):
+        return user_item_matrix
+    return InteractionMatrix.from_frame(user_item_matrix)
+
+
+# Compact column types for the MovieLens CSV files
+RATINGS_DTYPES = {'userId': np.int32, 'movieId': np.int32, 'rating': np.float32, 'timestamp': np.int64}
+MOVIES_DTYPES = {'movieId': np.int32, 'title': str, 'genres': str}
+CACHE_DIR = '.cache'
+CACHE_MANIFEST = 'columns.json'
+
+
+def _write_column_cache(frame, cache_path, source):
+    """Write each column as .npy; strings as a UTF-8 byte array plus offsets."""
+    staging = f'{cache_path}.tmp-{uuid.uuid4().hex[:8]}'
+    os.makedirs(staging)
+    try:
+        columns = {}
+        for column in frame.columns:
+            values = frame[column]
+            if values.dtype.kind in 'biuf':
+                np.save(os.path.join(staging, f'{column}.npy'), values.to_numpy())
+                columns[column] = 'array'
+            else:
+                encoded = [str(value).encode('utf-8') for value in values.fillna('')]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                np.cumsum([len(value) for value in encoded], out=offsets[1:])
+                np.save(os.path.join(staging, f'{column}.bytes.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+                np.save(os.path.join(staging, f'{column}.offsets.npy'), offsets)
+                columns[column] = 'string'
+        
+        with open(os.path.join(staging, CACHE_MANIFEST), 'w') as f:
+            json.dump({'source': source, 'columns': columns}, f, indent=2)
+        
+        if os.path.exists(cache_path):
+            shutil.rmtree(cache_path)
+        os.rename(staging, cache_path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _read_column_cache(cache_path, columns, mmap_mode):
+    data = {}
+    for column, kind in columns.items():
+        if kind == 'array':
+            data[column] = np.load(os.path.join(cache_path, f'{column}.npy'), mmap_mode=mmap_mode)
+        else:
+            raw = np.load(os.path.join(cache_path, f'{column}.bytes.npy')).tobytes()
+            offsets = np.load(os.path.join(cache_path, f'{column}.offsets.npy')).tolist()
+            data[column] = pd.array(
+                [raw[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])],
+                dtype=str
+            )
+    return pd.DataFrame(data, copy=False)
+
+
+def read_csv_cached(csv_path, dtypes, mmap_mode='c'):
+    """
+    Read a CSV file with explicit column types through a binary column cache.
+    
+    The first read parses the CSV and writes one .npy file per column under
+    a .cache directory next to it. Later reads load those files instead,
+    memory-mapping numeric columns, until the CSV's size or modification
+    time changes. The default copy-on-write mapping shares pages between
+    processes while keeping the returned columns writable; writes stay in
+    memory and never reach the cache.
+    """
+    stat = os.stat(csv_path)
+    source = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'dtypes': {column: np.dtype(dtype).str for column, dtype in dtypes.items()}
+    }
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    cache_path = os.path.join(os.path.dirname(csv_path), CACHE_DIR, name)
+    
+    try:
+        with open(os.path.join(cache_path, CACHE_MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest['source'] == source:
+            return _read_column_cache(cache_path, manifest['columns'], mmap_mode)
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    frame = pd.read_csv(csv_path, dtype=dtypes)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        _write_column_cache(frame, cache_path, source)
+    except OSError as e:
+        print(f"Could not write data cache for {csv_path}: {e}")
+    return frame
+
+
+def load_movies(data_path='data/ml-latest-small'):
+    """Load the movies table with compact column types."""
+    return read_csv_cached(os.path.join(data_path, 'movies.csv'), MOVIES_DTYPES)
+
+
 def load_data(data_path='data/ml-latest-small'):
     """
     Load MovieLens dataset and return processed DataFrames.
@@ -25,42 +400,80 @@ def load_data(data_path='data/ml-latest-small'):
         if not download_movielens_dataset():
             raise FileNotFoundError(f"Could not download or find the dataset files in {data_path}")
     
-    # Load ratings and movies data
-    ratings = pd.read_csv(ratings_path)
-    movies = pd.read_csv(movies_path)
+    # Load ratings and movies data; numeric columns are memory-mapped from
+    # the column cache after the first load
+    ratings = read_csv_cached(ratings_path, RATINGS_DTYPES)
+    movies = read_csv_cached(movies_path, MOVIES_DTYPES)
     
     print(f"Loaded {len(ratings)} ratings from {ratings['userId'].nunique()} users on {ratings['movieId'].nunique()} movies")
     
     return ratings, movies
 
-def prepare_data(ratings, test_size=0.2, random_state=42):
+def split_test_mask(user_ids, test_size=0.2, random_state=42, timestamps=None, min_ratings=5):
+    """
+    Choose test ratings for a per-user train/test split in one vectorised pass.
+    
+    Each user with at least min_ratings ratings puts ceil(test_size * n) of
+    their n ratings in the test set: a random selection, or the latest ones
+    when timestamps are given. Returns (test, eligible) boolean masks over
+    the ratings; ratings of users with too few ratings are in neither set.
+    """
+    user_ids = np.asarray(user_ids)
+    n_ratings = len(user_ids)
+    
+    # Order ratings by user, then by a random or timestamp rank within the user
+    if timestamps is None:
+        rank_keys = np.random.default_rng(random_state).random(n_ratings)
+    else:
+        rank_keys = np.asarray(timestamps)
+    order = np.lexsort((rank_keys, user_ids))
+    
+    sorted_users = user_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_users[1:] != sorted_users[:-1]]) if n_ratings else np.empty(0, dtype=np.int64)
+    counts = np.diff(np.r_[starts, n_ratings])
+    
+    # Position of each rating within its user's ordering
+    group_counts = np.repeat(counts, counts)
+    ranks = np.arange(n_ratings) - np.repeat(starts, counts)
+    n_test = np.ceil(test_size * group_counts).astype(np.int64)
+    
+    eligible = np.zeros(n_ratings, dtype=bool)
+    test = np.zeros(n_ratings, dtype=bool)
+    eligible[order] = group_counts >= min_ratings
+    test[order] = (group_counts >= min_ratings) & (ranks >= group_counts - n_test)
+    
+    return test, eligible
+
+def prepare_data(ratings, test_size=0.2, random_state=42, mode='random'):
     """
     Split data into train and test sets.
+    
+    mode='random' holds out a random share of each user's ratings;
+    mode='temporal' holds out each user's latest ratings by timestamp.
+    Only users with at least 5 ratings are kept, and at most half of a
+    user's ratings go to the test set.
+    
+    Returns a sparse InteractionMatrix built from the training ratings,
+    along with the train and test DataFrames.
     """
-    # First, group by user to ensure each user has both train and test data
-    user_groups = {}
-    for user_id, group in ratings.groupby('userId'):
-        # For each user, split their ratings
-        if len(group) >= 5:  # Only consider users with enough ratings
-            train, test = train_test_split(
-                group, 
-                test_size=min(test_size, 0.5),  # Ensure we don't take too many for test
-                random_state=random_state
-            )
-            user_groups[user_id] = (train, test)
+    if mode not in ('random', 'temporal'):
+        raise ValueError(f"Unknown split mode: {mode}")
+    
+    timestamps = ratings['timestamp'].values if mode == 'temporal' else None
+    test, eligible = split_test_mask(
+        ratings['userId'].values,
+        test_size=min(test_size, 0.5),  # Ensure we don't take too many for test
+        random_state=random_state,
+        timestamps=timestamps
+    )
     
-    # Combine all users' train and test data
-    train_data = pd.concat([t[0] for t in user_groups.values()])
-    test_data = pd.concat([t[1] for t in user_groups.values()])
+    train_data = ratings[eligible & ~test]
+    test_data = ratings[test]
     
     print(f"Split data into {len(train_data)} training and {len(test_data)} testing samples")
     
-    # Create user-item matrix from training data
-    user_item_matrix = train_data.pivot(
-        index='userId', 
-        columns='movieId', 
-        values='rating'
-    ).fillna(0)
+    # Create sparse user-item matrix from training data
+    user_item_matrix = InteractionMatrix.from_ratings(train_data)
     
     return user_item_matrix, train_data, test_data
 
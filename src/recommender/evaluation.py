@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 from sklearn.metrics import mean_squared_error
+from src.recommender.data import IdIndex
 
 def precision_at_k(recommended_items, actual_items, k=5):
     """
@@ -32,84 +34,198 @@ def recall_at_k(recommended_items, actual_items, k=5):
     
     return recall
 
-def evaluate_recommendations(model, test_data, movies_df, threshold=3.5, k=5, verbose=True):
+def liked_matrix(test_data, user_ids, threshold=3.5, min_test_ratings=2):
+    """
+    Build the ground truth for evaluation as a CSR matrix.
+    
+    Row i holds the movies user_ids[i] rated at least threshold in the test
+    set, with columns indexed by the returned IdIndex. Users with fewer than
+    min_test_ratings test ratings get an empty row.
+    Returns (liked, item_index).
+    """
+    users = IdIndex(np.asarray(user_ids))
+    test_users = test_data['userId'].values
+    rows = users.positions(test_users)
+    
+    counts = np.bincount(rows[rows >= 0], minlength=len(users))
+    keep = (rows >= 0) & (test_data['rating'].values >= threshold)
+    keep &= counts[np.maximum(rows, 0)] >= min_test_ratings
+    
+    items = IdIndex(np.unique(test_data['movieId'].values[keep]))
+    liked = csr_matrix(
+        (np.ones(keep.sum(), dtype=np.float32), (rows[keep], items.positions(test_data['movieId'].values[keep]))),
+        shape=(len(users), len(items))
+    )
+    liked.sum_duplicates()
+    liked.data[:] = 1
+    
+    return liked, items
+
+def ranking_metrics(recommended_ids, liked, item_index, k=10):
+    """
+    Compute ranking metrics for (n_users x K) recommendation arrays.
+    
+    recommended_ids is padded with -1; liked and item_index come from
+    liked_matrix for the same users. Precision divides by the number of
+    recommendations made (at most k), as precision_at_k does. Returns a
+    dict of per-user arrays: precision, recall, hit, ndcg and ap.
+    """
+    recommended_ids = np.asarray(recommended_ids)[:, :k]
+    n_users, n_ranks = recommended_ids.shape
+    
+    # Sorted (row, column) keys of the liked entries; CSR rows are in order
+    # and columns are sorted within each row
+    liked = liked.tocsr()
+    liked.sort_indices()
+    n_columns = max(liked.shape[1], 1)
+    liked_keys = np.repeat(np.arange(n_users, dtype=np.int64), np.diff(liked.indptr)) * n_columns + liked.indices
+    
+    columns = item_index.positions(recommended_ids.ravel()).reshape(recommended_ids.shape)
+    query_keys = np.arange(n_users, dtype=np.int64)[:, None] * n_columns + np.maximum(columns, 0)
+    found = np.searchsorted(liked_keys, query_keys)
+    found = np.minimum(found, max(len(liked_keys) - 1, 0))
+    hits = (columns >= 0) & (recommended_ids >= 0)
+    if len(liked_keys):
+        hits &= liked_keys[found] == query_keys
+    else:
+        hits[:] = False
+    
+    n_recommended = (recommended_ids >= 0).sum(axis=1)
+    n_liked = np.diff(liked.indptr)
+    n_hits = hits.sum(axis=1)
+    
+    # Discounted gains relative to the best possible ordering
+    discounts = 1.0 / np.log2(np.arange(n_ranks) + 2)
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])[np.minimum(n_liked, n_ranks)]
+    dcg = hits.dot(discounts)
+    
+    # Average precision over the ranks of the hits
+    precision_at_rank = np.cumsum(hits, axis=1) / np.arange(1, n_ranks + 1)
+    ap_denominator = np.minimum(n_liked, n_ranks)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'precision': np.where(n_recommended > 0, n_hits / np.maximum(n_recommended, 1), 0.0),
+            'recall': np.where(n_liked > 0, n_hits / np.maximum(n_liked, 1), 0.0),
+            'hit': (n_hits > 0).astype(np.float64),
+            'ndcg': np.where(ideal > 0, dcg / np.where(ideal > 0, ideal, 1), 0.0),
+            'ap': np.where(ap_denominator > 0, (precision_at_rank * hits).sum(axis=1) / np.maximum(ap_denominator, 1), 0.0)
+        }
+
+def recommend_all(model, user_ids, k=10, batch_size=1024):
+    """
+    Get (n_users x k) recommended movie IDs for many users, batch by batch.
+    
+    Uses recommend_items_batch when the model has it, otherwise calls
+    recommend_items per user. Rows are padded with -1.
+    """
+    user_ids = np.asarray(user_ids)
+    recommended_ids = np.full((len(user_ids), k), -1, dtype=np.int64)
+    
+    for start in range(0, len(user_ids), batch_size):
+        block = user_ids[start:start + batch_size]
+        if hasattr(model, 'recommend_items_batch'):
+            ids, _ = model.recommend_items_batch(block, n_recommendations=k)
+            recommended_ids[start:start + len(block), :ids.shape[1]] = ids[:, :k]
+            continue
+        
+        for offset, user_id in enumerate(block):
+            recs = model.recommend_items(user_id, n_recommendations=k)
+            ids = recs['movieId'].values[:k] if not recs.empty else []
+            recommended_ids[start + offset, :len(ids)] = ids
+    
+    return recommended_ids
+
+def evaluate_model(model, test_data, movies_df=None, threshold=3.5, k=10, n_users=None, seed=0,
+                   batch_size=1024, min_test_ratings=2):
+    """
+    Evaluate a recommendation model on every test user.
+    
+    Users with at least min_test_ratings test ratings and at least one
+    liked (>= threshold) test movie are evaluated; pass n_users to evaluate
+    a random sample of them drawn with seed instead. Recommendations are
+    requested in batches of batch_size users.
+    
+    Returns a dict with precision, recall, hit_rate, ndcg and map averaged
+    over evaluated users, catalogue coverage (share of movies_df, or of
+    test movies, recommended to anyone), the number of users evaluated and
+    the per-user metric arrays and recommendations under 'per_user'.
+    """
+    test_users = np.unique(test_data['userId'].values)
+    liked, item_index = liked_matrix(test_data, test_users, threshold, min_test_ratings)
+    
+    # Only users with something to find count towards the averages
+    eligible = np.diff(liked.indptr) > 0
+    eval_users = test_users[eligible]
+    liked = liked[eligible]
+    if n_users is not None and n_users < len(eval_users):
+        sample = np.sort(np.random.default_rng(seed).choice(len(eval_users), n_users, replace=False))
+        eval_users = eval_users[sample]
+        liked = liked[sample]
+    
+    recommended_ids = recommend_all(model, eval_users, k, batch_size)
+    per_user = ranking_metrics(recommended_ids, liked, item_index, k)
+    
+    recommended = np.unique(recommended_ids[recommended_ids >= 0])
+    catalogue_size = len(movies_df) if movies_df is not None else len(np.unique(test_data['movieId'].values))
+    
+    def mean(values):
+        return float(values.mean()) if values.size else 0.0
+    
+    return {
+        'precision': mean(per_user['precision']),
+        'recall': mean(per_user['recall']),
+        'hit_rate': mean(per_user['hit']),
+        'ndcg': mean(per_user['ndcg']),
+        'map': mean(per_user['ap']),
+        'coverage': len(recommended) / catalogue_size if catalogue_size else 0.0,
+        'n_users': len(eval_users),
+        'per_user': dict(per_user, user_ids=eval_users, recommended_ids=recommended_ids)
+    }
+
+def evaluate_recommendations(model, test_data, movies_df, threshold=3.5, k=5, verbose=True, n_users=None, seed=0):
     """
     Evaluate recommendation model using precision and recall.
     
     Parameters:
-    - model: Recommendation model with recommend_items method
+    - model: Recommendation model with recommend_items_batch or recommend_items method
     - test_data: DataFrame of test ratings
     - movies_df: DataFrame of movie metadata
     - threshold: Minimum rating to consider an item "liked"
     - k: Number of recommendations to evaluate
     - verbose: Whether to print detailed results
-    """
-    precision_scores = []
-    recall_scores = []
-    hit_rate = 0
-    
-    # Group test data by user
-    user_groups = test_data.groupby('userId')
-    test_users = test_data['userId'].unique()
-    print(f"Evaluating on {len(test_users)} users")
+    - n_users: Evaluate a seeded random sample of this many users instead of all of them
+    - seed: Seed for the sample
     
-    # Sample users for evaluation to avoid long processing time
-    eval_users = np.random.choice(test_users, min(50, len(test_users)), replace=False)
+    Returns (precision, recall, hit_rate); see evaluate_model for the full set of metrics.
+    """
+    results = evaluate_model(model, test_data, movies_df, threshold, k, n_users, seed)
+    print(f"Evaluating on {results['n_users']} users")
     
-    for user_id in eval_users:
-        # Get user test data
-        user_test_data = user_groups.get_group(user_id)
-        
-        # Skip users with too few ratings in test set
-        if len(user_test_data) < 2:
-            continue
-        
-        # Get items the user liked in the test set
-        actual_liked = user_test_data[user_test_data['rating'] >= threshold]['movieId'].tolist()
-        if not actual_liked:
-            continue
-            
-        # Get recommendations for this user
-        try:
-            recs = model.recommend_items(user_id, n_recommendations=k)
-            if recs.empty:
-                continue
-                
-            recommended_items = recs['movieId'].tolist()
-            
-            # Calculate precision and recall
-            prec = precision_at_k(recommended_items, actual_liked, k)
-            rec = recall_at_k(recommended_items, actual_liked, k)
+    if verbose:
+        per_user = results['per_user']
+        for row in range(min(3, results['n_users'])):
+            user_id = per_user['user_ids'][row]
+            recommended_items = per_user['recommended_ids'][row]
+            recommended_items = recommended_items[recommended_items >= 0][:5]
+            user_test_data = test_data[test_data['userId'] == user_id]
+            actual_liked = user_test_data[user_test_data['rating'] >= threshold]['movieId'].tolist()
             
-            precision_scores.append(prec)
-            recall_scores.append(rec)
+            print(f"\nUser {user_id} evaluation:")
+            # Get movie titles for better output
+            rec_titles = movies_df[movies_df['movieId'].isin(recommended_items)]['title'].tolist()
+            actual_titles = movies_df[movies_df['movieId'].isin(actual_liked[:5])]['title'].tolist()
             
-            if prec > 0:
-                hit_rate += 1
-                
-            # Print detailed results for some users
-            if verbose and len(precision_scores) <= 3:
-                print(f"\nUser {user_id} evaluation:")
-                # Get movie titles for better output
-                rec_titles = movies_df[movies_df['movieId'].isin(recommended_items[:5])]['title'].tolist()
-                actual_titles = movies_df[movies_df['movieId'].isin(actual_liked[:5])]['title'].tolist()
-                
-                print(f"  Recommended movies: {rec_titles}")
-                print(f"  Actually liked: {actual_titles}")
-                print(f"  Precision: {prec:.4f}, Recall: {rec:.4f}")
-                
-        except Exception as e:
-            print(f"Error evaluating user {user_id}: {e}")
-    
-    # Calculate average metrics
-    avg_precision = np.mean(precision_scores) if precision_scores else 0
-    avg_recall = np.mean(recall_scores) if recall_scores else 0
-    hit_rate = hit_rate / len(eval_users) if eval_users.size > 0 else 0
-    
-    if verbose:
-        print(f"\nEvaluation results on {len(precision_scores)} valid users:")
-        print(f"Hit Rate: {hit_rate:.4f} (proportion of users with at least one relevant recommendation)")
-        print(f"Precision@{k}: {avg_precision:.4f}")
-        print(f"Recall@{k}: {avg_recall:.4f}")
+            print(f"  Recommended movies: {rec_titles}")
+            print(f"  Actually liked: {actual_titles}")
+            print(f"  Precision: {per_user['precision'][row]:.4f}, Recall: {per_user['recall'][row]:.4f}")
+        
+        print(f"\nEvaluation results on {results['n_users']} users:")
+        print(f"Hit Rate: {results['hit_rate']:.4f} (proportion of users with at least one relevant recommendation)")
+        print(f"Precision@{k}: {results['precision']:.4f}")
+        print(f"Recall@{k}: {results['recall']:.4f}")
+        print(f"NDCG@{k}: {results['ndcg']:.4f}")
+        print(f"MAP@{k}: {results['map']:.4f}")
+        print(f"Catalogue coverage: {results['coverage']:.4f}")
     
-    return avg_precision, avg_recall, hit_rate
+    return results['precision'], results['recall'], results['hit_rate']
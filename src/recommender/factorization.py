@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.recommender.scoring import BLOCK_BYTES
+
+
+def length_blocks(lengths, n_factors, max_bytes=BLOCK_BYTES):
+    """
+    Split rows into blocks of similar length for padded batch solves.
+
+    Rows are ordered by their number of entries, and each block holds as
+    many consecutive rows, up to twice the length of its shortest, as keep
+    its padded (n_rows x longest x n_factors) float32 gather under
+    max_bytes. Yields arrays of row indices.
+    """
+    order = np.argsort(lengths, kind='stable')
+    sorted_lengths = lengths[order]
+    row_bytes = 4 * n_factors * np.maximum(sorted_lengths, 1)
+    start = 0
+    while start < len(order):
+        # Rows at most twice as long as the first, so padding at most doubles
+        # the work
+        high = int(np.searchsorted(sorted_lengths, 2 * max(sorted_lengths[start], 8), side='right'))
+
+        # Rows after start are at least as long, so a block's padded size is
+        # its row count times its last row's size; binary search the largest
+        # block that fits
+        low = start + 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if (middle - start) * row_bytes[middle - 1] <= max_bytes:
+                low = middle
+            else:
+                high = middle - 1
+        yield order[start:low]
+        start = low
+
+
+def _conjugate_gradient(lhs, rhs, initial, steps):
+    """
+    Approximately solve a stack of symmetric positive definite systems with
+    a few conjugate gradient steps from initial guesses, all rows at once.
+    """
+    x = initial.copy()
+    residual = rhs - np.matmul(lhs, x[:, :, None])[:, :, 0]
+    direction = residual.copy()
+    residual_norm = np.einsum('ij,ij->i', residual, residual)
+    for _ in range(steps):
+        product = np.matmul(lhs, direction[:, :, None])[:, :, 0]
+        curvature = np.einsum('ij,ij->i', direction, product)
+        step = np.divide(residual_norm, curvature, out=np.zeros_like(residual_norm), where=curvature > 0)
+        x += step[:, None] * direction
+        residual -= step[:, None] * product
+        new_norm = np.einsum('ij,ij->i', residual, residual)
+        ratio = np.divide(new_norm, residual_norm, out=np.zeros_like(new_norm), where=residual_norm > 0)
+        direction = residual + ratio[:, None] * direction
+        residual_norm = new_norm
+    return x
+
+
+def _solve_block(ratings, rows, fixed, gram, regularization, alpha, initial=None, cg_steps=3):
+    """
+    Least-squares factors for some rows of a CSR matrix against fixed factors.
+
+    Each row u solves (F^T C_u F + reg I) x_u = F^T C_u p_u, where p_u is 1
+    for rated items and C_u weights them by 1 + alpha * rating. F^T C_u F is
+    the shared gram F^T F plus the rated items' factors weighted by
+    alpha * rating. Those factors are gathered into a zero-padded
+    (n_rows x longest x n_factors) array so the per-row products are one
+    batched matrix product. Without initial factors all rows are solved
+    exactly as one stacked system; with them, cg_steps conjugate gradient
+    steps refine them, which costs O(n_factors^2) per row instead of
+    O(n_factors^3).
+    """
+    n_factors = fixed.shape[1]
+    starts = ratings.indptr[rows]
+    lengths = ratings.indptr[rows + 1] - starts
+    if not lengths.any():
+        # Rows without ratings solve to zero factors
+        return np.zeros((len(rows), n_factors), dtype=np.float32)
+    width = max(int(lengths.max(initial=0)), 1)
+
+    offsets = np.arange(width)
+    valid = offsets < lengths[:, None]
+    positions = np.where(valid, starts[:, None] + offsets, 0)
+    confidence = np.where(valid, alpha * ratings.data[positions].astype(np.float32), 0)
+    gathered = fixed[ratings.indices[positions]]
+
+    lhs = np.matmul(gathered.transpose(0, 2, 1), gathered * confidence[:, :, None])
+    lhs += gram + regularization * np.eye(n_factors, dtype=np.float32)
+    rhs = np.matmul((valid + confidence)[:, None, :], gathered)[:, 0, :]
+    if initial is None:
+        return np.linalg.solve(lhs, rhs[:, :, None])[:, :, 0]
+    return _conjugate_gradient(lhs, rhs, initial, cg_steps)
+
+
+def solve_factors(ratings, fixed, regularization, alpha, n_threads=1, rows=None, initial=None, cg_steps=3,
+                  gram=None):
+    """
+    One alternating least squares half-step: the factors of the rows of a
+    CSR rating matrix given the fixed factors of its columns.
+
+    Rows are solved in blocks from length_blocks, spread over n_threads
+    threads; numpy releases the GIL in the gathers, products and solves, so
+    blocks run in parallel. rows limits the solve to those rows (default:
+    all). Given initial factors for those rows, they are refined with
+    cg_steps conjugate gradient steps instead of solved exactly. gram is
+    fixed^T fixed if already known. Returns (n_rows x n_factors) float32 factors.
+    """
+    rows = np.arange(ratings.shape[0]) if rows is None else np.asarray(rows)
+    fixed = np.ascontiguousarray(fixed, dtype=np.float32)
+    gram = fixed.T.dot(fixed) if gram is None else gram
+    factors = np.zeros((len(rows), fixed.shape[1]), dtype=np.float32)
+
+    def solve(block):
+        block_initial = None if initial is None else initial[block]
+        factors[block] = _solve_block(
+            ratings, rows[block], fixed, gram, regularization, alpha, block_initial, cg_steps
+        )
+
+    blocks = list(length_blocks(np.diff(ratings.indptr)[rows], fixed.shape[1]))
+    if n_threads <= 1 or len(blocks) <= 1:
+        for block in blocks:
+            solve(block)
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            # list() re-raises any error from the threads
+            list(pool.map(solve, blocks))
+    return factors
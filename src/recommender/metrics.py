@@ -0,0 +1,170 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from 100us to 10s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram for one label set."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and latency histograms.
+
+    Metrics are identified by name and a set of labels. Recording is a
+    dictionary lookup and a few additions under a lock, so it is cheap
+    enough for per-request and per-batch hot paths. render() returns the
+    Prometheus text exposition format; summary() returns a plain table for
+    scripts.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._counter_callbacks = []
+        self._gauge_callbacks = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        """Set the HELP text of a metric."""
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        """Increase a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record a value, in seconds, in a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def add_counters(self, callback):
+        """
+        Register a function returning [(name, labels dict, value)] for
+        counters kept elsewhere, e.g. cache hits; it is called whenever the
+        metrics are rendered.
+        """
+        self._counter_callbacks.append(callback)
+
+    def add_gauges(self, callback):
+        """
+        Register a function returning [(name, labels dict, value)] that is
+        called whenever the metrics are rendered, e.g. to report cache stats.
+        """
+        self._gauge_callbacks.append(callback)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the enclosed block into the span_seconds histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('span_seconds', time.perf_counter() - start, span=name, **labels)
+
+    def reset(self):
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (list(h.counts), h.count, h.sum) for key, h in self._histograms.items()
+            }
+        for callback in self._counter_callbacks:
+            for name, labels, value in callback():
+                counters[(name, tuple(sorted(labels.items())))] = value
+        gauges = []
+        for callback in self._gauge_callbacks:
+            gauges.extend(callback())
+        return counters, histograms, gauges
+
+    def render(self, prefix='recommender_'):
+        """Return all metrics in the Prometheus text exposition format."""
+        counters, histograms, gauges = self._snapshot()
+        lines = []
+
+        def header(name, kind):
+            full_name = prefix + name
+            if name in self._help:
+                lines.append(f'# HELP {full_name} {self._help[name]}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            return full_name
+
+        for name in sorted({name for name, _ in counters}):
+            full_name = header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{full_name}{_label_text(labels)} {value}')
+
+        for name in sorted({name for name, _, _ in gauges}):
+            full_name = header(name, 'gauge')
+            for metric, labels, value in gauges:
+                if metric == name:
+                    lines.append(f'{full_name}{_label_text(tuple(sorted(labels.items())))} {value}')
+
+        for name in sorted({name for name, _ in histograms}):
+            full_name = header(name, 'histogram')
+            for (metric, labels), (counts, count, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{full_name}_bucket{_label_text(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{full_name}_count{_label_text(labels)} {count}')
+                lines.append(f'{full_name}_sum{_label_text(labels)} {total}')
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Return a readable table of histogram counts, totals and means."""
+        _, histograms, _ = self._snapshot()
+        rows = []
+        for (name, labels), (_, count, total) in sorted(histograms.items()):
+            label = ', '.join(f'{key}={value}' for key, value in labels)
+            mean = total / count * 1000 if count else 0.0
+            rows.append(f'{name}{{{label}}}: {count} calls, {total:.3f}s total, {mean:.3f}ms mean')
+        return '\n'.join(rows)
+
+
+# Process-wide registry shared by the models, the web app and scripts
+REGISTRY = MetricsRegistry()
+span = REGISTRY.span
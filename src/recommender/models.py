@@ -1,150 +1,801 @@
+import copy
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import normalize
 from scipy.sparse import csr_matrix
+from src.recommender.data import IdIndex, InteractionMatrix, as_interaction_matrix
+from src.recommender.scoring import (
+    neighbour_scores_batch, mask_rated_batch, top_n_batch, top_k_similar, refresh_top_k, row_blocks
+)
+from src.recommender.neighbours import ExactNeighbours
+from src.recommender.factorization import solve_factors
+from src.recommender.parallel import default_n_jobs
+from src.recommender.metrics import span
 
-class CollaborativeFiltering:
+def _positive_row_max(scores):
+    """Row maxima over finite scores, with 1 for rows without a positive score."""
+    row_max = np.where(np.isfinite(scores), scores, 0).max(axis=1, initial=0)
+    return np.where(row_max > 0, row_max, 1).astype(scores.dtype)
+
+class _RatingsModel:
     """
-    Collaborative filtering recommendation model.
+    Shared plumbing of the models that score items from a user-item rating
+    matrix. Subclasses implement score_rows, for known users' rows, and
+    score_ratings, for sparse ratings of users not in the model; both
+    return dense scores over the items with rated items at -inf.
     """
     
-    def __init__(self, k=10):
-        """Initialize with number of neighbors k."""
-        # Ensure k is an integer to prevent sklearn errors
-        self.k = int(k)
-        self.model = None
-        self.user_item_matrix = None
+    def _set_ratings(self, interactions):
+        self.user_item_matrix = interactions
+        
+        # The sparsity pattern of the rating matrix doubles as the
+        # precomputed mask of items each user has already rated
+        self.ratings_sparse = interactions.matrix
+        
+        # Map raw user IDs to matrix rows and matrix columns to movie IDs
+        self.user_index = interactions.users
+        self.item_ids = interactions.items.ids
     
-    def fit(self, user_item_matrix):
+    def _apply_ratings(self, new_ratings):
         """
-        Train the model using user-item matrix.
+        Add new ratings to the rating matrix and item means; returns the
+        applied changes (see InteractionMatrix.with_ratings).
         """
-        self.user_item_matrix = user_item_matrix
+        old_n_users = self.ratings_sparse.shape[0]
+        interactions, changes = self.user_item_matrix.with_ratings(new_ratings)
+        n_users, n_items = interactions.shape
         
-        # Create sparse matrix for efficiency
-        user_item_sparse = csr_matrix(user_item_matrix.values)
+        # Item means are column sums over all users, so adjust the sums by
+        # the rating deltas and divide by the new user count
+        sums = np.zeros(n_items, dtype=np.float64)
+        sums[:len(self.item_means)] = np.asarray(self.item_means, dtype=np.float64) * old_n_users
+        deltas = changes['rating'].values - changes['previous'].fillna(0).values
+        sums += np.bincount(changes['column'].values, weights=deltas, minlength=n_items)
+        self.item_means = (sums / max(n_users, 1)).astype(np.float32)
         
-        # Train KNN model
-        self.model = NearestNeighbors(metric='cosine', algorithm='brute', n_neighbors=self.k+1)
-        self.model.fit(user_item_sparse)
+        self._set_ratings(interactions)
+        return changes
+    
+    def _fill_empty(self, scores, rated):
+        """
+        Users with nothing new to recommend fall back to the items with the
+        best average rating.
+        """
+        empty = scores.max(axis=1) <= 0
+        if empty.any():
+            empty_rows = np.flatnonzero(empty)
+            fallback = np.tile(self.item_means, (len(empty_rows), 1))
+            scores[empty_rows] = mask_rated_batch(fallback, rated[empty_rows])
+        return scores
+    
+    def session_ratings(self, sessions):
+        """
+        Build a sparse (n_sessions x n_items) rating matrix over the model's
+        items from lists of (movieId, rating) pairs, e.g. the ratings a new
+        user gave in the current session.
         
-        return self
+        Movies the model does not know are ignored; a movie rated more than
+        once keeps its last rating.
+        """
+        lengths = [len(pairs) for pairs in sessions]
+        pairs = np.array([pair for session in sessions for pair in session], dtype=np.float64).reshape(-1, 2)
+        session_rows = np.repeat(np.arange(len(sessions)), lengths)
+        columns = self.user_item_matrix.items.positions(pairs[:, 0].astype(np.int64))
+        
+        # Keep the last rating of each known (session, movie) pair
+        keys = (session_rows * len(self.item_ids) + columns)[::-1]
+        _, last = np.unique(keys, return_index=True)
+        keep = len(keys) - 1 - last
+        keep = keep[columns[keep] >= 0]
+        
+        return csr_matrix(
+            (pairs[keep, 1].astype(self.ratings_sparse.dtype), (session_rows[keep], columns[keep])),
+            shape=(len(sessions), len(self.item_ids))
+        )
+    
+    def _top_items(self, scores, n_recommendations):
+        """Top N movie IDs and scores per row, padded with ID -1 and score 0."""
+        with span('top_n'):
+            top_items, top_scores = top_n_batch(scores, n_recommendations)
+        valid = top_scores > 0
+        return np.where(valid, self.item_ids[top_items], -1), np.where(valid, top_scores, 0)
+    
+    def recommend_items_batch(self, user_ids, n_recommendations=5):
+        """
+        Recommend top N items for many users at once.
+        
+        Returns (n_users x N) arrays of movie IDs and scores, best first.
+        Rows are padded with movie ID -1 and score 0 for unknown users or
+        when fewer than N items can be recommended.
+        """
+        rows = self.user_index.positions(user_ids)
+        n_recommendations = min(int(n_recommendations), len(self.item_ids))
+        
+        recommended_ids = np.full((len(rows), n_recommendations), -1, dtype=self.item_ids.dtype)
+        recommended_scores = np.zeros((len(rows), n_recommendations), dtype=np.float32)
+        
+        known = np.flatnonzero(rows >= 0)
+        for start, end in row_blocks(len(known), len(self.item_ids)):
+            block = known[start:end]
+            scores = self.score_rows(rows[block])
+            recommended_ids[block], recommended_scores[block] = self._top_items(scores, n_recommendations)
+        
+        return recommended_ids, recommended_scores
+    
+    def recommend_for_ratings_batch(self, sessions, n_recommendations=5):
+        """
+        Recommend top N items for users who are not in the model, from
+        lists of (movieId, rating) pairs.
+        
+        Returns (n_sessions x N) arrays of movie IDs and scores, best first,
+        padded with movie ID -1 and score 0.
+        """
+        rated = self.session_ratings(sessions)
+        n_recommendations = min(int(n_recommendations), len(self.item_ids))
+        
+        recommended_ids = np.full((len(sessions), n_recommendations), -1, dtype=self.item_ids.dtype)
+        recommended_scores = np.zeros((len(sessions), n_recommendations), dtype=np.float32)
+        
+        for start, end in row_blocks(len(sessions), len(self.item_ids)):
+            scores = self.score_ratings(rated[start:end])
+            recommended_ids[start:end], recommended_scores[start:end] = self._top_items(scores, n_recommendations)
+        
+        return recommended_ids, recommended_scores
     
     def recommend_items(self, user_id, n_recommendations=5):
         """
         Recommend top N items for a user.
         """
-        if user_id not in self.user_item_matrix.index:
+        if user_id not in self.user_index:
             print(f"User {user_id} not found in training data")
             return pd.DataFrame()
         
-        # Get user's item ratings vector
-        user_vector = self.user_item_matrix.loc[user_id].values.reshape(1, -1)
-        user_vector_sparse = csr_matrix(user_vector)
-        
         try:
-            # Find similar users
-            distances, indices = self.model.kneighbors(user_vector_sparse, n_neighbors=min(self.k+1, len(self.user_item_matrix)))
-            
-            # Get indices of similar users (exclude the user itself)
-            similar_users = [self.user_item_matrix.index[idx] for idx in indices.flatten()[1:]]
-            
-            # Build recommendations based on what similar users liked
-            user_rated_items = set(self.user_item_matrix.columns[self.user_item_matrix.loc[user_id] > 0])
-            recommendations = {}
-            
-            # Calculate weighted ratings from similar users
-            for similar_user in similar_users:
-                similar_user_ratings = self.user_item_matrix.loc[similar_user]
-                
-                # Consider items that the target user hasn't rated
-                for item in self.user_item_matrix.columns:
-                    item_id = item  # The column name is the item ID
-                    if similar_user_ratings[item] > 0 and item not in user_rated_items:
-                        if item_id not in recommendations:
-                            recommendations[item_id] = 0
-                        # The closer the similar user, the more weight their recommendation has
-                        recommendations[item_id] += similar_user_ratings[item]
-            
-            # If no recommendations found, try using average ratings
-            if not recommendations:
-                # Find items the user hasn't rated but are generally well-rated
-                item_means = self.user_item_matrix.mean().sort_values(ascending=False)
-                for item, rating in item_means.items():
-                    if item not in user_rated_items and rating > 0:
-                        recommendations[item] = rating
-                        if len(recommendations) >= n_recommendations:
-                            break
-            
-            # Sort by recommendation strength
-            sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+            recommended_ids, recommended_scores = self.recommend_items_batch([user_id], n_recommendations)
+            valid = recommended_ids[0] >= 0
             
             # Return top N recommendations
-            top_recommendations = pd.DataFrame(sorted_recommendations[:n_recommendations], 
-                                              columns=['movieId', 'score'])
+            top_recommendations = pd.DataFrame({
+                'movieId': recommended_ids[0][valid],
+                'score': recommended_scores[0][valid]
+            })
             
             return top_recommendations
             
         except Exception as e:
             print(f"Error generating recommendations for user {user_id}: {e}")
             return pd.DataFrame()
+    
+    def recommend_for_ratings(self, ratings, n_recommendations=5):
+        """
+        Recommend top N items for a user who is not in the model, from a
+        list of (movieId, rating) pairs.
+        """
+        recommended_ids, recommended_scores = self.recommend_for_ratings_batch([ratings], n_recommendations)
+        valid = recommended_ids[0] >= 0
+        return pd.DataFrame({
+            'movieId': recommended_ids[0][valid],
+            'score': recommended_scores[0][valid]
+        })
+
+class CollaborativeFiltering(_RatingsModel):
+    """
+    Collaborative filtering recommendation model.
+    """
+    
+    def __init__(self, k=10, neighbour_index=None, precompute_neighbours=False):
+        """
+        Initialize with number of neighbors k and the index used to search
+        for them, e.g. IVFNeighbours for approximate search (default: an
+        exact ExactNeighbours search). With precompute_neighbours, fit also
+        finds every user's neighbours once and serves known users from that
+        graph instead of searching per request.
+        """
+        # Ensure k is an integer to prevent sklearn errors
+        self.k = int(k)
+        self.neighbour_index = neighbour_index if neighbour_index is not None else ExactNeighbours()
+        self.precompute_neighbours = bool(precompute_neighbours)
+        self.user_item_matrix = None
+        self.ratings_sparse = None
+        self.user_index = None
+        self.item_ids = None
+        self.item_means = None
+        self.user_vectors = None
+        self._neighbour_graph = None
+    
+    def fit(self, user_item_matrix):
+        """
+        Train the model using user-item matrix.
+        
+        Accepts the sparse InteractionMatrix produced by prepare_data, or a
+        dense pivoted DataFrame.
+        """
+        self._set_ratings(as_interaction_matrix(user_item_matrix))
+        
+        # Average rating per item, used when neighbours have nothing to offer
+        self.item_means = np.asarray(self.ratings_sparse.mean(axis=0), dtype=np.float32).ravel()
+        
+        # Cosine KNN: with L2-normalised rows, similarity is a dot product
+        self.user_vectors = normalize(self.ratings_sparse, norm='l2', axis=1).tocsr()
+        self.neighbour_index.fit(self.user_vectors)
+        
+        # Training data is static until the next fit or update, so the
+        # neighbours of every user can be found once, in blocks
+        self._neighbour_graph = None
+        if self.precompute_neighbours:
+            self._neighbour_graph = self.compute_neighbour_graph()
+        
+        return self
+    
+    def update(self, new_ratings):
+        """
+        Fold new ratings into the fitted model without refitting.
+        
+        new_ratings is a DataFrame with userId, movieId and rating columns;
+        new users and movies are added and re-ratings replace old values.
+        Item means are updated from the changed ratings only, and a
+        precomputed neighbour graph is refreshed only where the changed
+        users can affect it. Returns the applied changes (see
+        InteractionMatrix.with_ratings).
+        """
+        changes = self._apply_ratings(new_ratings)
+        n_users = self.ratings_sparse.shape[0]
+        
+        self.user_vectors = normalize(self.ratings_sparse, norm='l2', axis=1).tocsr()
+        self.neighbour_index.update(self.user_vectors)
+        
+        if self._neighbour_graph is not None:
+            affected = np.zeros(n_users, dtype=bool)
+            affected[changes['row'].values] = True
+            self._refresh_neighbour_graph(affected)
+        
+        return changes
+    
+    def _refresh_neighbour_graph(self, affected):
+        """
+        Bring the neighbour graph up to date after the rating vectors of the
+        affected users changed (see refresh_top_k).
+        """
+        neighbours, similarities = self._neighbour_graph
+        searcher = self.with_k(neighbours.shape[1])
+        self._neighbour_graph = refresh_top_k(
+            self.user_vectors, neighbours, similarities, affected, searcher._find_neighbours
+        )
+    
+    def get_state(self):
+        """Return the fitted model as parameters and arrays for save_bundle."""
+        return {
+            'k': self.k,
+            'precompute_neighbours': self.precompute_neighbours,
+            'ratings': self.ratings_sparse,
+            'user_ids': self.user_index.ids,
+            'item_ids': self.item_ids,
+            'item_means': self.item_means,
+            'user_vectors': self.user_vectors,
+            'neighbour_index': self.neighbour_index,
+            **self._graph_state()
+        }
+    
+    def _graph_state(self):
+        if self._neighbour_graph is None:
+            return {}
+        return {
+            'neighbour_indices': self._neighbour_graph[0],
+            'neighbour_similarities': self._neighbour_graph[1]
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a fitted model from get_state output without refitting."""
+        model = cls(k=state['k'], neighbour_index=state['neighbour_index'],
+                    precompute_neighbours=state['precompute_neighbours'])
+        model.user_item_matrix = InteractionMatrix(state['ratings'], state['user_ids'], state['item_ids'])
+        model.ratings_sparse = model.user_item_matrix.matrix
+        model.user_index = model.user_item_matrix.users
+        model.item_ids = model.user_item_matrix.items.ids
+        model.item_means = state['item_means']
+        model.user_vectors = state['user_vectors']
+        if 'neighbour_indices' in state:
+            model._neighbour_graph = (state['neighbour_indices'], state['neighbour_similarities'])
+        return model
+    
+    def compute_neighbour_graph(self, k=None):
+        """
+        Find the k nearest neighbours of every user, one block of users at a time.
+        
+        Returns (n_users x k) int32 neighbour rows and float32 similarities,
+        most similar first. k defaults to the model's k.
+        """
+        k = self.k if k is None else int(k)
+        n_users = self.ratings_sparse.shape[0]
+        model = self if k == self.k else self.with_k(k)
+        
+        neighbours = np.zeros((n_users, min(k, n_users)), dtype=np.int32)
+        similarities = np.zeros(neighbours.shape, dtype=np.float32)
+        for start, end in row_blocks(n_users, n_users):
+            neighbours[start:end], similarities[start:end] = model._find_neighbours(np.arange(start, end))
+        
+        return neighbours, similarities
+    
+    def with_k(self, k):
+        """Return a copy of the fitted model using k neighbours, sharing its arrays."""
+        model = copy.copy(self)
+        model.k = int(k)
+        model._neighbour_graph = None
+        return model
+    
+    def with_neighbour_graph(self, neighbours, similarities):
+        """
+        Return a copy of the fitted model that takes neighbours from a
+        precomputed graph instead of searching for them.
+        
+        Since graph rows are sorted by similarity, the first k columns of a
+        graph computed for a larger k are the k nearest neighbours (up to
+        ties), so one graph can serve every smaller k.
+        """
+        model = self.with_k(neighbours.shape[1])
+        model._neighbour_graph = (neighbours, similarities)
+        return model
+    
+    def _find_neighbours(self, rows):
+        """Return the k most similar user rows and their cosine similarities for each row."""
+        if self._neighbour_graph is not None:
+            return self._neighbour_graph[0][rows], self._neighbour_graph[1][rows]
+        
+        # Exclude each user itself, which is not guaranteed to rank first when
+        # other users have identical rating vectors
+        return self._search_neighbours(self.user_vectors[rows], exclude_rows=rows)
+    
+    def _search_neighbours(self, vectors, exclude_rows=None):
+        """
+        Return the k user rows most similar to each L2-normalised query
+        vector and their cosine similarities, skipping exclude_rows.
+        """
+        return self.neighbour_index.search(vectors, self.k, exclude_rows)
+    
+    def _score(self, rated, neighbours, similarities):
+        """
+        Score every item from the neighbours of a block of users with the
+        given sparse ratings; rated items are set to -inf. Users whose
+        neighbours have nothing new to offer get the item means instead.
+        """
+        with span('scoring'):
+            scores = neighbour_scores_batch(self.ratings_sparse, neighbours, similarities)
+            mask_rated_batch(scores, rated)
+        
+        return self._fill_empty(scores, rated)
+    
+    def score_rows(self, rows):
+        """
+        Score every item for a block of known user rows.
+        
+        Returns a dense (n_rows x n_items) array with rated items set to
+        -inf.
+        """
+        # One batched neighbour query and one sparse product for the block
+        with span('neighbour_search'):
+            neighbours, similarities = self._find_neighbours(rows)
+        return self._score(self.ratings_sparse[rows], neighbours, similarities)
+    
+    def score_ratings(self, rated):
+        """
+        Score every item for users who are not in the model, given their
+        sparse ratings from session_ratings.
+        
+        The ratings are folded in as a query vector for the same neighbour
+        search and scoring as a known user; the model is not changed.
+        Returns a dense (n_rows x n_items) array with rated items set to -inf.
+        """
+        # L2-normalise the rows directly; sklearn's input checks cost more
+        # than the arithmetic for a handful of ratings
+        vectors = rated.copy()
+        row_lengths = np.diff(vectors.indptr)
+        norms = np.sqrt(np.bincount(np.repeat(np.arange(len(row_lengths)), row_lengths),
+                                    weights=vectors.data.astype(np.float64) ** 2, minlength=len(row_lengths)))
+        vectors.data /= np.repeat(np.where(norms > 0, norms, 1), row_lengths).astype(vectors.dtype)
+        
+        with span('neighbour_search'):
+            neighbours, similarities = self._search_neighbours(vectors)
+        return self._score(rated, neighbours, similarities)
+
+class ItemBasedCF(_RatingsModel):
+    """
+    Item-based collaborative filtering model.
+    
+    Instead of searching for similar users per request, the model keeps for
+    each item its k most similar items, by cosine similarity of their rating
+    columns. A user's score for an item is the sum, over the items they
+    rated, of their rating times that item's similarity to it: a sparse
+    gather over the neighbour lists of the rated items.
+    """
+    
+    def __init__(self, k=50):
+        """Initialize with the number of similar items k kept per item."""
+        self.k = int(k)
+        self.user_item_matrix = None
+        self.ratings_sparse = None
+        self.user_index = None
+        self.item_ids = None
+        self.item_means = None
+        self.neighbor_indices = None
+        self.neighbor_similarities = None
+        self._similarity = None
+    
+    def _item_vectors(self):
+        """L2-normalised rating columns of the items, as CSR rows."""
+        return normalize(self.user_item_matrix.item_matrix.T, norm='l2', axis=1).tocsr()
+    
+    def fit(self, user_item_matrix):
+        """
+        Train the model using user-item matrix.
+        
+        Accepts the sparse InteractionMatrix produced by prepare_data, or a
+        dense pivoted DataFrame.
+        """
+        self._set_ratings(as_interaction_matrix(user_item_matrix))
+        
+        # Average rating per item, used when rated items have no neighbours
+        self.item_means = np.asarray(self.ratings_sparse.mean(axis=0), dtype=np.float32).ravel()
+        
+        # Calculate the top-K item-item table from the CSC copy, block by block
+        self.neighbor_indices, self.neighbor_similarities = top_k_similar(self._item_vectors(), self.k)
+        self._similarity = None
+        
+        return self
+    
+    def update(self, new_ratings):
+        """
+        Fold new ratings into the fitted model without refitting.
+        
+        Items whose ratings changed get their neighbours searched again, as
+        do items that had one of them as a neighbour. All other items only
+        compare against the changed items. Returns the applied changes (see
+        InteractionMatrix.with_ratings).
+        """
+        changes = self._apply_ratings(new_ratings)
+        affected = np.zeros(len(self.item_ids), dtype=bool)
+        affected[changes['column'].values] = True
+        neighbours, similarities = refresh_top_k(
+            self._item_vectors(), self.neighbor_indices, self.neighbor_similarities, affected
+        )
+        
+        self.neighbor_indices, self.neighbor_similarities = neighbours, similarities
+        self._similarity = None
+        return changes
+    
+    def get_state(self):
+        """Return the fitted model as parameters and arrays for save_bundle."""
+        return {
+            'k': self.k,
+            'ratings': self.ratings_sparse,
+            'user_ids': self.user_index.ids,
+            'item_ids': self.item_ids,
+            'item_means': self.item_means,
+            'neighbor_indices': self.neighbor_indices,
+            'neighbor_similarities': self.neighbor_similarities
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a fitted model from get_state output without refitting."""
+        model = cls(k=state['k'])
+        model._set_ratings(InteractionMatrix(state['ratings'], state['user_ids'], state['item_ids']))
+        model.item_means = state['item_means']
+        model.neighbor_indices = state['neighbor_indices']
+        model.neighbor_similarities = state['neighbor_similarities']
+        return model
+    
+    def with_k(self, k):
+        """
+        Return a copy of the fitted model keeping only the k most similar
+        items per item, sharing its arrays. k cannot exceed the fitted k.
+        """
+        model = copy.copy(self)
+        model.k = min(int(k), self.neighbor_indices.shape[1])
+        model.neighbor_indices = self.neighbor_indices[:, :model.k]
+        model.neighbor_similarities = self.neighbor_similarities[:, :model.k]
+        model._similarity = None
+        return model
+    
+    def _similarity_matrix(self):
+        """The neighbour table as a sparse (n_items x n_items) matrix, built on first use."""
+        if self._similarity is None:
+            n_items, k = self.neighbor_indices.shape
+            self._similarity = csr_matrix(
+                (np.asarray(self.neighbor_similarities).ravel(), np.asarray(self.neighbor_indices).ravel(),
+                 np.arange(0, n_items * k + 1, k)),
+                shape=(n_items, n_items)
+            )
+        return self._similarity
+    
+    def _score(self, rated):
+        with span('scoring'):
+            scores = rated.dot(self._similarity_matrix()).toarray()
+            mask_rated_batch(scores, rated)
+        return self._fill_empty(scores, rated)
+    
+    def score_rows(self, rows):
+        """
+        Score every item for a block of known user rows.
+        
+        Returns a dense (n_rows x n_items) array with rated items set to
+        -inf.
+        """
+        return self._score(self.ratings_sparse[rows])
+    
+    def score_ratings(self, rated):
+        """
+        Score every item for users who are not in the model, given their
+        sparse ratings from session_ratings. The model is not changed.
+        """
+        return self._score(rated)
+
+class MatrixFactorization(_RatingsModel):
+    """
+    Latent factor model trained with alternating least squares.
+    
+    Ratings are treated as implicit feedback: every rated item is a positive
+    preference with confidence 1 + alpha * rating, and unrated items are
+    negatives with confidence 1. Users and items get float32 factor vectors,
+    so the model is (n_users + n_items) x factors, and a user's scores for
+    every item are one dense product of their factors with the item factors.
+    Each half-step solves all user (or item) factors in blocks spread over
+    n_threads threads. Training refines the previous factors with cg_steps
+    conjugate gradient steps per half-step; folding in new ratings solves
+    exactly.
+    """
+    
+    def __init__(self, factors=32, regularization=1.0, alpha=1.0, iterations=10, cg_steps=3, seed=0,
+                 n_threads=None):
+        """
+        Initialize with the number of latent factors, the L2 regularization,
+        the confidence scale of ratings, the number of ALS iterations and
+        conjugate gradient steps per half-step, and the number of training
+        threads (default: one per core).
+        """
+        self.factors = int(factors)
+        self.regularization = float(regularization)
+        self.alpha = float(alpha)
+        self.iterations = int(iterations)
+        self.cg_steps = int(cg_steps)
+        self.seed = seed
+        self.n_threads = n_threads
+        self.user_item_matrix = None
+        self.ratings_sparse = None
+        self.user_index = None
+        self.item_ids = None
+        self.item_means = None
+        self.user_factors = None
+        self.item_factors = None
+        self._item_gram = None
+    
+    def _solve(self, ratings, fixed, rows=None, initial=None, gram=None):
+        n_threads = self.n_threads or default_n_jobs()
+        return solve_factors(
+            ratings, fixed, self.regularization, self.alpha, n_threads, rows, initial, self.cg_steps, gram
+        )
+    
+    def fit(self, user_item_matrix):
+        """
+        Train the model using user-item matrix.
+        
+        Accepts the sparse InteractionMatrix produced by prepare_data, or a
+        dense pivoted DataFrame.
+        """
+        self._set_ratings(as_interaction_matrix(user_item_matrix))
+        
+        # Average rating per item, used when no item scores positively
+        self.item_means = np.asarray(self.ratings_sparse.mean(axis=0), dtype=np.float32).ravel()
+        
+        n_users, n_items = self.ratings_sparse.shape
+        rng = np.random.default_rng(self.seed)
+        self.user_factors = rng.normal(0, 0.01, (n_users, self.factors)).astype(np.float32)
+        self.item_factors = rng.normal(0, 0.01, (n_items, self.factors)).astype(np.float32)
+        item_ratings = self.ratings_sparse.T.tocsr()
+        for _ in range(self.iterations):
+            self.user_factors = self._solve(self.ratings_sparse, self.item_factors, initial=self.user_factors)
+            self.item_factors = self._solve(item_ratings, self.user_factors, initial=self.item_factors)
+        self._item_gram = None
+        
+        return self
+    
+    def update(self, new_ratings):
+        """
+        Fold new ratings into the fitted model without refitting.
+        
+        The factors of users whose ratings changed are solved again against
+        the item factors, then those of the items they rated against the
+        user factors; new users and items get factors the same way. Other
+        factors are unchanged. Returns the applied changes (see
+        InteractionMatrix.with_ratings).
+        """
+        changes = self._apply_ratings(new_ratings)
+        n_users, n_items = self.ratings_sparse.shape
+        
+        user_factors = np.zeros((n_users, self.factors), dtype=np.float32)
+        user_factors[:len(self.user_factors)] = self.user_factors
+        item_factors = np.zeros((n_items, self.factors), dtype=np.float32)
+        item_factors[:len(self.item_factors)] = self.item_factors
+        
+        user_rows = np.unique(changes['row'].values)
+        item_rows = np.unique(changes['column'].values)
+        user_factors[user_rows] = self._solve(self.ratings_sparse, item_factors, user_rows)
+        item_factors[item_rows] = self._solve(self.ratings_sparse.T.tocsr(), user_factors, item_rows)
+        
+        self.user_factors, self.item_factors = user_factors, item_factors
+        self._item_gram = None
+        return changes
+    
+    def get_state(self):
+        """Return the fitted model as parameters and arrays for save_bundle."""
+        return {
+            'factors': self.factors,
+            'regularization': self.regularization,
+            'alpha': self.alpha,
+            'iterations': self.iterations,
+            'cg_steps': self.cg_steps,
+            'seed': self.seed,
+            'ratings': self.ratings_sparse,
+            'user_ids': self.user_index.ids,
+            'item_ids': self.item_ids,
+            'item_means': self.item_means,
+            'user_factors': self.user_factors,
+            'item_factors': self.item_factors
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a fitted model from get_state output without refitting."""
+        model = cls(
+            factors=state['factors'], regularization=state['regularization'], alpha=state['alpha'],
+            iterations=state['iterations'], cg_steps=state['cg_steps'], seed=state['seed']
+        )
+        model._set_ratings(InteractionMatrix(state['ratings'], state['user_ids'], state['item_ids']))
+        model.item_means = state['item_means']
+        model.user_factors = state['user_factors']
+        model.item_factors = state['item_factors']
+        return model
+    
+    def _score(self, user_factors, rated):
+        with span('scoring'):
+            scores = user_factors.dot(self.item_factors.T)
+            mask_rated_batch(scores, rated)
+        return self._fill_empty(scores, rated)
+    
+    def score_rows(self, rows):
+        """
+        Score every item for a block of known user rows.
+        
+        Returns a dense (n_rows x n_items) array with rated items set to
+        -inf.
+        """
+        return self._score(self.user_factors[rows], self.ratings_sparse[rows])
+    
+    def score_ratings(self, rated):
+        """
+        Score every item for users who are not in the model, given their
+        sparse ratings from session_ratings. Their factors are solved
+        against the item factors as in training; the model is not changed.
+        """
+        if self._item_gram is None:
+            self._item_gram = self.item_factors.T.dot(self.item_factors)
+        with span('fold_in'):
+            user_factors = self._solve(csr_matrix(rated), self.item_factors, gram=self._item_gram)
+        return self._score(user_factors, rated)
 
 class ContentBasedFiltering:
     """
     Content-based recommendation model.
+    
+    Instead of a dense all-pairs similarity matrix the model keeps, for each
+    movie, only its n_neighbors most similar movies.
     """
     
-    def __init__(self):
-        """Initialize the content-based model."""
-        self.movie_features = None
-        self.similarity_matrix = None
+    def __init__(self, n_neighbors=50):
+        """Initialize with the number of similar movies kept per movie."""
+        self.n_neighbors = int(n_neighbors)
         self.movies_df = None
+        self.movie_ids = None
+        self.movie_index = None
+        self.feature_vectors = None
+        self.neighbor_indices = None
+        self.neighbor_similarities = None
     
     def fit(self, movie_features, movies_df):
         """
         Train the model using movie features.
         """
-        self.movie_features = movie_features
         self.movies_df = movies_df
         
-        # Extract feature matrix without movie IDs
-        feature_matrix = movie_features.drop('movieId', axis=1).values
+        # Map movie IDs to feature matrix rows
+        self.movie_ids = movie_features['movieId'].values.astype(np.int32)
+        self.movie_index = IdIndex(self.movie_ids)
         
-        # Calculate similarity matrix
-        self.similarity_matrix = cosine_similarity(feature_matrix)
+        # Extract feature matrix without movie IDs, normalised so that dot
+        # products are cosine similarities
+        feature_matrix = csr_matrix(movie_features.drop('movieId', axis=1).values, dtype=np.float32)
+        self.feature_vectors = normalize(feature_matrix, norm='l2', axis=1).tocsr()
+        
+        # Calculate the top-K neighbour table block by block
+        self.neighbor_indices, self.neighbor_similarities = top_k_similar(
+            self.feature_vectors, self.n_neighbors
+        )
         
         return self
     
-    def recommend_similar_movies(self, movie_id, n_recommendations=5):
-        """
-        Recommend similar movies based on a given movie ID.
+    def get_state(self):
+        """Return the fitted model as parameters and arrays for save_bundle."""
+        return {
+            'n_neighbors': self.n_neighbors,
+            'movie_ids': self.movie_ids,
+            'feature_vectors': self.feature_vectors,
+            'neighbor_indices': self.neighbor_indices,
+            'neighbor_similarities': self.neighbor_similarities
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a fitted model from get_state output without refitting."""
+        model = cls(n_neighbors=state['n_neighbors'])
+        model.movie_ids = state['movie_ids']
+        model.movie_index = IdIndex(model.movie_ids)
+        model.feature_vectors = state['feature_vectors']
+        model.neighbor_indices = state['neighbor_indices']
+        model.neighbor_similarities = state['neighbor_similarities']
+        return model
+    
+    def profile_scores(self, profiles):
         """
-        # Find the index of the movie in the feature matrix
-        movie_indices = self.movie_features.index[self.movie_features['movieId'] == movie_id].tolist()
+        Score every movie against content profiles.
         
-        if not movie_indices:
-            return pd.DataFrame()
+        profiles is a sparse (n_profiles x n_movies) matrix of weights over
+        the model's movies, e.g. a user's ratings of the movies they liked.
+        Each profile is the weighted sum of those movies' feature vectors;
+        returns the dense (n_profiles x n_movies) cosine similarity of each
+        movie to each profile, zero for empty profiles.
+        """
+        profile_vectors = normalize(profiles.dot(self.feature_vectors), norm='l2', axis=1)
+        # Profiles have as few dimensions as there are features, so a sparse
+        # times dense product gives the dense scores directly
+        dense_profiles = np.asarray(profile_vectors.T.todense(), dtype=np.float32)
+        return np.ascontiguousarray(self.feature_vectors.dot(dense_profiles).T)
+    
+    def recommend_similar_movies_batch(self, movie_ids, n_recommendations=5):
+        """
+        Recommend similar movies for many movie IDs at once.
         
-        movie_idx = movie_indices[0]
+        Returns (n_movies x N) arrays of movie IDs and similarities, most
+        similar first, with rows for unknown movies padded with ID -1. N is
+        capped at the n_neighbors the model was fitted with.
+        """
+        rows = self.movie_index.positions(movie_ids)
+        n_recommendations = min(int(n_recommendations), self.neighbor_indices.shape[1])
         
-        # Get similarity scores for this movie with all others
-        similarity_scores = list(enumerate(self.similarity_matrix[movie_idx]))
+        similar_ids = np.full((len(rows), n_recommendations), -1, dtype=self.movie_ids.dtype)
+        similarities = np.zeros((len(rows), n_recommendations), dtype=np.float32)
         
-        # Sort movies by similarity score
-        similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
+        # Each query is a single read from the neighbour table
+        known = np.flatnonzero(rows >= 0)
+        similar_ids[known] = self.movie_ids[self.neighbor_indices[rows[known], :n_recommendations]]
+        similarities[known] = self.neighbor_similarities[rows[known], :n_recommendations]
         
-        # Get the top N most similar movies (excluding itself)
-        similar_movies_indices = [i[0] for i in similarity_scores[1:n_recommendations+1]]
+        return similar_ids, similarities
+    
+    def recommend_similar_movies(self, movie_id, n_recommendations=5):
+        """
+        Recommend similar movies based on a given movie ID.
         
-        # Get the movie IDs
-        similar_movie_ids = self.movie_features.iloc[similar_movies_indices]['movieId'].values
-        similarity_values = [i[1] for i in similarity_scores[1:n_recommendations+1]]
+        At most n_neighbors movies are returned, the size of the neighbour
+        table the model was fitted with.
+        """
+        row = self.movie_index.get(movie_id)
+        if row < 0:
+            return pd.DataFrame()
         
-        # Create recommendations dataframe
+        # Create recommendations dataframe from the movie's neighbour table row
         recommendations = pd.DataFrame({
-            'movieId': similar_movie_ids,
-            'similarity': similarity_values
+            'movieId': self.movie_ids[self.neighbor_indices[row, :n_recommendations]],
+            'similarity': self.neighbor_similarities[row, :n_recommendations]
         })
         
         return recommendations
@@ -154,69 +805,276 @@ class HybridRecommender:
     Hybrid recommendation model that combines collaborative and content-based filtering.
     """
     
-    def __init__(self, cf_weight=0.7):
-        """Initialize with weight for collaborative filtering recommendations."""
-        self.cf_model = CollaborativeFiltering(k=20)
+    def __init__(self, cf_weight=0.7, profile_threshold=4.0, cf_model=None):
+        """
+        Initialize with weight for collaborative filtering recommendations,
+        the minimum rating of movies in a user's content profile and an
+        unfitted collaborative model, e.g. ItemBasedCF or
+        MatrixFactorization (default: CollaborativeFiltering(k=20)).
+        """
+        self.cf_model = cf_model if cf_model is not None else CollaborativeFiltering(k=20)
         self.cb_model = ContentBasedFiltering()
         self.cf_weight = cf_weight
+        self.profile_threshold = profile_threshold
         self.item_popularity = None
         self.movies_df = None
+        self._catalogue_layout = None
         
-    def fit(self, user_item_matrix, movie_features, movies_df, ratings_df):
-        """Train both models and compute item popularity."""
+    def fit(self, user_item_matrix, movie_features, movies_df, ratings_df=None):
+        """
+        Train both models and compute item popularity, from ratings_df or,
+        without it, from the collaborative model's rating matrix.
+        """
         # Train component models
         self.cf_model.fit(user_item_matrix)
         self.cb_model.fit(movie_features, movies_df)
         self.movies_df = movies_df
+        self._catalogue_layout = None
         
         # Calculate item popularity
-        self.item_popularity = ratings_df.groupby('movieId')['rating'].agg(['count', 'mean'])
+        if ratings_df is not None:
+            self.item_popularity = ratings_df.groupby('movieId')['rating'].agg(['count', 'mean'])
+        else:
+            ratings = self.cf_model.ratings_sparse
+            count = ratings.getnnz(axis=0)
+            total = np.asarray(ratings.sum(axis=0), dtype=np.float64).ravel()
+            self.item_popularity = pd.DataFrame({
+                'count': count,
+                'mean': (total / np.maximum(count, 1)).astype(ratings.dtype)
+            }, index=pd.Index(self.cf_model.item_ids, name='movieId'))
         self.item_popularity['score'] = self.item_popularity['count'] * self.item_popularity['mean']
         self.item_popularity = self.item_popularity.sort_values('score', ascending=False)
         
         return self
+    
+    def update(self, new_ratings):
+        """
+        Fold new ratings into the collaborative model and item popularity
+        without refitting.
         
-    def recommend_items(self, user_id, n_recommendations=5):
-        """Get hybrid recommendations for a user."""
-        # Get collaborative filtering recommendations
-        cf_recs = self.cf_model.recommend_items(user_id, n_recommendations=n_recommendations*2)
-        
-        if cf_recs.empty:
-            # Fallback to popularity-based recommendations
-            popular_items = self.item_popularity.index[:n_recommendations].tolist()
-            return pd.DataFrame({'movieId': popular_items, 'score': range(n_recommendations, 0, -1)})
-        
-        # Get user's top-rated movie
-        user_vector = self.cf_model.user_item_matrix.loc[user_id]
-        if user_vector.max() > 0:
-            top_movie_id = user_vector.idxmax()
-            # Get content-based recommendations
-            cb_recs = self.cb_model.recommend_similar_movies(top_movie_id, n_recommendations=n_recommendations*2)
-        else:
-            cb_recs = pd.DataFrame()
+        Popularity counts and means are adjusted only for the movies that
+        received ratings. The content model depends on movie metadata, not
+        ratings, so it is unchanged. Returns the applied changes.
+        """
+        changes = self.cf_model.update(new_ratings)
+        self._catalogue_layout = None
+        
+        # Re-ratings change a movie's rating total but not its count
+        changes = changes.assign(
+            added=changes['previous'].isna().astype(np.int64),
+            delta=changes['rating'] - changes['previous'].fillna(0)
+        )
+        totals = changes.groupby('movieId')[['added', 'delta']].sum()
+        
+        popularity = self.item_popularity[['count', 'mean']].reindex(
+            self.item_popularity.index.union(totals.index), fill_value=0
+        )
+        totals = totals.reindex(popularity.index, fill_value=0)
+        count = popularity['count'] + totals['added']
+        total = popularity['count'] * popularity['mean'].astype(np.float64) + totals['delta']
+        popularity = pd.DataFrame({
+            'count': count,
+            'mean': (total / count.where(count > 0)).fillna(0).astype(self.item_popularity['mean'].dtype)
+        })
+        popularity['score'] = popularity['count'] * popularity['mean']
+        self.item_popularity = popularity.sort_values('score', ascending=False)
+        
+        return changes
+    
+    def get_state(self):
+        """Return the fitted model as parameters, arrays and component models for save_bundle."""
+        return {
+            'cf_weight': self.cf_weight,
+            'profile_threshold': self.profile_threshold,
+            'cf_model': self.cf_model,
+            'cb_model': self.cb_model,
+            'popularity_ids': self.item_popularity.index.values,
+            'popularity_count': self.item_popularity['count'].values,
+            'popularity_mean': self.item_popularity['mean'].values,
+            'popularity_score': self.item_popularity['score'].values
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a fitted model from get_state output without refitting."""
+        model = cls(cf_weight=state['cf_weight'], profile_threshold=state['profile_threshold'])
+        model.cf_model = state['cf_model']
+        model.cb_model = state['cb_model']
+        model.item_popularity = pd.DataFrame({
+            'count': state['popularity_count'],
+            'mean': state['popularity_mean'],
+            'score': state['popularity_score']
+        }, index=pd.Index(state['popularity_ids'], name='movieId'))
+        return model
+        
+    def _catalogue(self):
+        """
+        Column layout shared by both components' scores: the content model's
+        movies, followed by any movies only the CF model knows (e.g. added
+        by update). Returns (movie_ids, cf_columns, cf_to_content) where
+        cf_to_content is each CF item's content row, or -1.
+        """
+        if self._catalogue_layout is None:
+            content_ids = self.cb_model.movie_ids
+            cf_to_content = self.cb_model.movie_index.positions(self.cf_model.item_ids)
+            cf_only = np.flatnonzero(cf_to_content < 0)
             
-        # If no content-based recommendations, just return collaborative filtering
-        if cb_recs.empty:
-            return cf_recs.head(n_recommendations)
+            cf_columns = cf_to_content.astype(np.int64)
+            cf_columns[cf_only] = len(content_ids) + np.arange(len(cf_only))
+            movie_ids = np.concatenate([content_ids, self.cf_model.item_ids[cf_only]]).astype(np.int32)
+            self._catalogue_layout = (movie_ids, cf_columns, cf_to_content)
+        return self._catalogue_layout
+    
+    def _content_profiles(self, ratings, cf_to_content):
+        """
+        Weights of each user's liked movies over the content model's rows,
+        from a block of sparse ratings over the CF items.
+        
+        Liked movies are those rated at least profile_threshold, weighted by
+        rating; users with none use their top-rated movie instead.
+        """
+        n_rows = ratings.shape[0]
+        rated = ratings.tocoo()
+        liked = rated.data >= self.profile_threshold
+        
+        # Users without a liked movie fall back to their top-rated one
+        has_liked = np.bincount(rated.row[liked], minlength=n_rows) > 0
+        missing = np.flatnonzero(~has_liked)
+        if missing.size:
+            top_columns = np.asarray(ratings[missing].argmax(axis=1)).ravel()
+            top_of_row = np.full(n_rows, -1)
+            top_of_row[missing] = top_columns
+            liked |= rated.col == top_of_row[rated.row]
+        
+        content_rows = cf_to_content[rated.col]
+        keep = liked & (content_rows >= 0)
+        return csr_matrix(
+            (rated.data[keep], (rated.row[keep], content_rows[keep])),
+            shape=(n_rows, len(self.cb_model.movie_ids))
+        )
+    
+    def _empty_results(self, n_users, n_recommendations, cf_weights):
+        return [
+            (np.full((n_users, n_recommendations), -1, dtype=np.int32),
+             np.zeros((n_users, n_recommendations), dtype=np.float32))
+            for _ in cf_weights
+        ]
+    
+    def _blend_block(self, results, block, cf_scores, ratings, cf_weights):
+        """
+        Blend CF scores (rated items at -inf) with content profile scores
+        from the ratings for a block of users, and write each weight's top N
+        into results.
+        """
+        movie_ids, cf_columns, cf_to_content = self._catalogue()
+        n_columns = len(movie_ids)
+        n_content = len(self.cb_model.movie_ids)
+        n_top = min(results[0][0].shape[1], n_columns)
+        
+        with span('content_profile'):
+            content_scores = self.cb_model.profile_scores(self._content_profiles(ratings, cf_to_content))
+        
+        with span('blend'):
+            rated = np.isneginf(cf_scores)
+            cf_scores[rated] = 0
+            cf_scores /= _positive_row_max(cf_scores)[:, None]
+            content_scores /= _positive_row_max(content_scores)[:, None]
             
-        # Merge and weight the recommendations
-        # Normalize scores for both recommendation types
-        cf_recs['normalized_score'] = cf_recs['score'] / cf_recs['score'].max()
-        cb_recs['normalized_score'] = cb_recs['similarity'] / cb_recs['similarity'].max()
-        
-        # Combine recommendations
-        cf_recs = cf_recs.rename(columns={'normalized_score': 'cf_score'})
-        cb_recs = cb_recs.rename(columns={'normalized_score': 'cb_score'})
-        
-        # Outer join to get all recommendations
-        hybrid_recs = pd.merge(cf_recs[['movieId', 'cf_score']], 
-                              cb_recs[['movieId', 'cb_score']], 
-                              on='movieId', 
-                              how='outer').fillna(0)
-        
-        # Calculate weighted hybrid score
-        hybrid_recs['score'] = (self.cf_weight * hybrid_recs['cf_score'] + 
-                               (1 - self.cf_weight) * hybrid_recs['cb_score'])
-        
-        # Sort and take top N
-        return hybrid_recs.sort_values('score', ascending=False)[['movieId', 'score']].head(n_recommendations)
+            for (recommended_ids, recommended_scores), weight in zip(results, cf_weights):
+                scores = np.zeros((len(cf_scores), n_columns), dtype=np.float32)
+                scores[:, cf_columns] = np.where(rated, -np.inf, weight * cf_scores)
+                scores[:, :n_content] += (1 - weight) * content_scores
+                
+                top, top_scores = top_n_batch(scores, n_top)
+                valid = np.isfinite(top_scores) & (top_scores > 0)
+                recommended_ids[block, :n_top] = np.where(valid, movie_ids[top], -1)
+                recommended_scores[block, :n_top] = np.where(valid, top_scores, 0)
+    
+    def _fill_popular(self, results, rows):
+        """Recommend the most popular movies to the given result rows."""
+        for recommended_ids, recommended_scores in results:
+            n_recommendations = recommended_ids.shape[1]
+            popular_items = self.item_popularity.index.values[:n_recommendations]
+            columns = np.arange(len(popular_items))
+            recommended_ids[np.ix_(rows, columns)] = popular_items
+            recommended_scores[np.ix_(rows, columns)] = np.arange(len(popular_items), 0, -1)
+    
+    def recommend_items_for_weights(self, user_ids, n_recommendations=5, cf_weights=None):
+        """
+        Get hybrid recommendations for many users at once, for one or more
+        collaborative filtering weights.
+        
+        Each block of users is scored over the whole catalogue by both
+        components once: CF scores for every item, and the cosine of every
+        movie to a content profile built from all the movies the user liked.
+        Both are normalised by their row maximum and blended in place as
+        weight * cf + (1 - weight) * content for each weight, with rated
+        movies excluded. Unknown users get the most popular movies.
+        
+        Returns a list with one (ids, scores) pair of (n_users x N) arrays
+        per weight (default: the model's weight), best first, padded with
+        movie ID -1 and score 0.
+        """
+        cf_weights = [self.cf_weight] if cf_weights is None else list(cf_weights)
+        rows = self.cf_model.user_index.positions(np.asarray(user_ids))
+        results = self._empty_results(len(rows), int(n_recommendations), cf_weights)
+        
+        known = np.flatnonzero(rows >= 0)
+        for start, end in row_blocks(len(known), 3 * len(self._catalogue()[0])):
+            block = known[start:end]
+            cf_scores = self.cf_model.score_rows(rows[block])
+            self._blend_block(results, block, cf_scores, self.cf_model.ratings_sparse[rows[block]], cf_weights)
+        
+        # Fallback to popularity-based recommendations
+        self._fill_popular(results, np.flatnonzero(rows < 0))
+        return results
+    
+    def recommend_for_ratings_batch(self, sessions, n_recommendations=5):
+        """
+        Get hybrid recommendations for users who are not in the model, from
+        lists of (movieId, rating) pairs.
+        
+        The ratings are folded into both components as a query, with the
+        same scoring and blending as for a known user and without changing
+        the model. Sessions with no known movies get the most popular ones.
+        Returns (n_sessions x N) arrays of movie IDs and scores.
+        """
+        ratings = self.cf_model.session_ratings(sessions)
+        results = self._empty_results(len(sessions), int(n_recommendations), [self.cf_weight])
+        
+        for start, end in row_blocks(len(sessions), 3 * len(self._catalogue()[0])):
+            block = np.arange(start, end)
+            cf_scores = self.cf_model.score_ratings(ratings[start:end])
+            self._blend_block(results, block, cf_scores, ratings[start:end], [self.cf_weight])
+        
+        self._fill_popular(results, np.flatnonzero(ratings.getnnz(axis=1) == 0))
+        return results[0]
+    
+    def recommend_items_batch(self, user_ids, n_recommendations=5):
+        """
+        Get hybrid recommendations for many users at once.
+        
+        Returns (n_users x N) arrays of movie IDs and scores, best first,
+        padded with movie ID -1 and score 0.
+        """
+        return self.recommend_items_for_weights(user_ids, n_recommendations)[0]
+    
+    def recommend_items(self, user_id, n_recommendations=5):
+        """Get hybrid recommendations for a user."""
+        recommended_ids, recommended_scores = self.recommend_items_batch([user_id], n_recommendations)
+        valid = recommended_ids[0] >= 0
+        
+        return pd.DataFrame({
+            'movieId': recommended_ids[0][valid],
+            'score': recommended_scores[0][valid]
+        })
+    
+    def recommend_for_ratings(self, ratings, n_recommendations=5):
+        """Get hybrid recommendations for a new user from a list of (movieId, rating) pairs."""
+        recommended_ids, recommended_scores = self.recommend_for_ratings_batch([ratings], n_recommendations)
+        valid = recommended_ids[0] >= 0
+        
+        return pd.DataFrame({
+            'movieId': recommended_ids[0][valid],
+            'score': recommended_scores[0][valid]
+        })
@@ -0,0 +1,236 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+from src.recommender.scoring import top_n_batch, row_blocks
+
+
+class ExactNeighbours:
+    """
+    Brute-force cosine neighbour search.
+
+    With L2-normalised rows the similarity of a query to every user is one
+    sparse product with the transpose of the user vectors, so each query
+    costs time linear in the number of users.
+    """
+
+    def __init__(self):
+        self.vectors_t = None
+
+    def fit(self, vectors):
+        """Index L2-normalised user vectors (CSR)."""
+        self.vectors_t = vectors.T.tocsr()
+        return self
+
+    def update(self, vectors):
+        """Re-index after user vectors changed or users were added."""
+        return self.fit(vectors)
+
+    def search(self, queries, k, exclude_rows=None):
+        """
+        Return the k rows most similar to each L2-normalised query and their
+        cosine similarities, most similar first. exclude_rows gives, for
+        each query, a row it must not return (e.g. the querying user).
+        """
+        similarities = queries.dot(self.vectors_t).toarray()
+        if exclude_rows is not None:
+            similarities[np.arange(len(exclude_rows)), exclude_rows] = -np.inf
+        neighbours, similarities = top_n_batch(similarities, k)
+
+        # Only happens when k is at least the number of users
+        similarities[np.isinf(similarities)] = 0
+
+        return neighbours, similarities
+
+    def get_state(self):
+        return {'vectors_t': self.vectors_t}
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls()
+        index.vectors_t = state['vectors_t']
+        return index
+
+
+class IVFNeighbours:
+    """
+    Approximate cosine neighbour search with an inverted file.
+
+    A coarse quantizer (spherical k-means over the normalised user vectors)
+    splits the users into n_lists lists, and each list keeps its own
+    inverted index from items to the users who rated them. A query only
+    reads the postings of its items in its n_probe closest lists, so it
+    costs about n_probe / n_lists of an exact search. n_probe trades recall
+    for speed; n_probe = n_lists is an exact search.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = int(n_probe)
+        self.n_iter = int(n_iter)
+        self.seed = seed
+        # Stored transposed, (n_items x n_lists), so sparse products with it
+        # do not copy it
+        self.centroids_t = None
+        # Sorted item * n_lists + list keys and, per key, the users of that
+        # list who rated that item with their vector values
+        self.posting_keys = None
+        self.postings = None
+
+    def _assign(self, vectors):
+        """Index of the closest centroid for each row."""
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start, end in row_blocks(vectors.shape[0], self.centroids_t.shape[1]):
+            assignment[start:end] = np.asarray(vectors[start:end].dot(self.centroids_t)).argmax(axis=1)
+        return assignment
+
+    def fit(self, vectors):
+        """Train the quantizer on L2-normalised user vectors (CSR) and index them."""
+        n_rows = vectors.shape[0]
+        n_lists = min(self.n_lists or max(1, int(round(np.sqrt(n_rows)))), max(n_rows, 1))
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(n_rows, n_lists, replace=False)].toarray().astype(np.float32)
+        self.centroids_t = np.ascontiguousarray(centroids.T)
+
+        for _ in range(self.n_iter):
+            assignment = self._assign(vectors)
+            members = csr_matrix(
+                (np.ones(n_rows, dtype=np.float32), (assignment, np.arange(n_rows))),
+                shape=(n_lists, n_rows)
+            )
+            sums = members.dot(vectors).toarray()
+            # Empty lists keep their previous centroid
+            filled = np.asarray(members.sum(axis=1)).ravel() > 0
+            centroids[filled] = normalize(sums[filled], norm='l2', axis=1)
+            self.centroids_t = np.ascontiguousarray(centroids.T)
+
+        return self.update(vectors)
+
+    def update(self, vectors):
+        """
+        Re-index user vectors against the trained centroids, after vectors
+        changed or users or items were added. The quantizer is not retrained;
+        items added since it was trained get zero centroid weights.
+        """
+        n_items, n_lists = self.centroids_t.shape
+        if vectors.shape[1] > n_items:
+            self.centroids_t = np.vstack([
+                self.centroids_t, np.zeros((vectors.shape[1] - n_items, n_lists), dtype=self.centroids_t.dtype)
+            ])
+        vectors = vectors.tocoo()
+        assignment = self._assign(vectors.tocsr())
+        keys = vectors.col.astype(np.int64) * self.centroids_t.shape[1] + assignment[vectors.row]
+        self.posting_keys, key_rows = np.unique(keys, return_inverse=True)
+        self.postings = csr_matrix(
+            (vectors.data, (key_rows.ravel(), vectors.row)),
+            shape=(len(self.posting_keys), vectors.shape[0])
+        )
+        return self
+
+    def search(self, queries, k, exclude_rows=None):
+        """
+        Return about the k rows most similar to each L2-normalised query and
+        their cosine similarities, most similar first; see
+        ExactNeighbours.search. Users outside the probed lists count as
+        having similarity 0. Only users found in the probed postings are
+        scored, so a query does not touch every user.
+        """
+        n_queries = queries.shape[0]
+        n_items, n_lists = self.centroids_t.shape
+        if queries.shape[1] != n_items:
+            raise ValueError(f"Queries have {queries.shape[1]} items but the index has {n_items}; call update first")
+        k = min(int(k), self.postings.shape[1])
+        probes, _ = top_n_batch(np.asarray(queries.dot(self.centroids_t)), min(self.n_probe, n_lists))
+
+        # Look up the postings of each query's items in its probed lists.
+        # With sorted probes the keys ascend within each query, which keeps
+        # the lookups cache friendly.
+        queries = csr_matrix(queries)
+        entry_rows = np.repeat(np.arange(n_queries), np.diff(queries.indptr))
+        probes = np.sort(probes, axis=1)
+        keys = (queries.indices[:, None].astype(np.int64) * n_lists + probes[entry_rows]).ravel()
+        positions = np.minimum(np.searchsorted(self.posting_keys, keys), len(self.posting_keys) - 1)
+        found = self.posting_keys[positions] == keys
+        positions = positions[found]
+        weights = np.repeat(queries.data, probes.shape[1])[found]
+        posting_rows = np.repeat(entry_rows, probes.shape[1])[found]
+
+        # Gather those postings directly; a scipy sparse product would scan
+        # the whole index for its dtype checks on every call
+        indptr = self.postings.indptr
+        starts = indptr[positions]
+        lengths = indptr[positions + 1] - starts
+        offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths) + np.arange(lengths.sum())
+        users = self.postings.indices[offsets].astype(np.int64)
+        products = self.postings.data[offsets] * np.repeat(weights, lengths)
+
+        # Accumulate the products per (query, user) pair over the touched
+        # users only, so the cost follows the probed postings rather than
+        # the number of users
+        n_users = self.postings.shape[1]
+        codes, pair_of_product = np.unique(np.repeat(posting_rows, lengths) * n_users + users, return_inverse=True)
+        sums = np.bincount(pair_of_product.ravel(), weights=products, minlength=len(codes))
+        candidate_queries, candidate_users = codes // n_users, codes % n_users
+        if exclude_rows is not None:
+            exclude_rows = np.asarray(exclude_rows)
+            keep = candidate_users != exclude_rows[candidate_queries]
+            candidate_queries, candidate_users, sums = candidate_queries[keep], candidate_users[keep], sums[keep]
+
+        # Each query's k best candidates, most similar first
+        order = np.lexsort((-sums, candidate_queries))
+        candidate_queries, candidate_users, sums = candidate_queries[order], candidate_users[order], sums[order]
+        ranks = np.arange(len(order)) - np.searchsorted(candidate_queries, candidate_queries)
+        top = ranks < k
+        neighbours = np.zeros((n_queries, k), dtype=np.intp)
+        similarities = np.zeros((n_queries, k), dtype=np.float32)
+        neighbours[candidate_queries[top], ranks[top]] = candidate_users[top]
+        similarities[candidate_queries[top], ranks[top]] = sums[top]
+
+        counts = np.bincount(candidate_queries[top], minlength=n_queries)
+        short = np.flatnonzero(counts < k)
+        if short.size:
+            self._pad(neighbours, counts, short, exclude_rows)
+
+        return neighbours, similarities
+
+    def _pad(self, neighbours, counts, short, exclude_rows):
+        """
+        Fill the rows of queries with fewer than k candidates with other
+        users at similarity 0, as an exact search would return them.
+        """
+        k = neighbours.shape[1]
+        # The first k + 1 users hold enough users that are neither a
+        # candidate nor excluded
+        pool = np.arange(min(k + 1, self.postings.shape[1]))
+        rows = neighbours[short]
+        filled = np.arange(k) < counts[short, None]
+        taken = ((pool[None, :, None] == rows[:, None, :]) & filled[:, None, :]).any(axis=2)
+        excluded = np.zeros_like(taken) if exclude_rows is None else pool == exclude_rows[short, None]
+        fillers = pool[np.argsort(2 * taken + excluded, axis=1, kind='stable')]
+        filler_columns = np.maximum(np.arange(k) - counts[short, None], 0)
+        rows[~filled] = np.take_along_axis(fillers, filler_columns, axis=1)[~filled]
+        neighbours[short] = rows
+
+    def get_state(self):
+        return {
+            'n_lists': self.n_lists,
+            'n_probe': self.n_probe,
+            'n_iter': self.n_iter,
+            'seed': self.seed,
+            'centroids_t': self.centroids_t,
+            'posting_keys': self.posting_keys,
+            'postings': self.postings
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        index = cls(state['n_lists'], state['n_probe'], state['n_iter'], state['seed'])
+        index.centroids_t = state['centroids_t']
+        index.posting_keys = state['posting_keys']
+        index.postings = state['postings']
+        return index
+
+    def with_n_probe(self, n_probe):
+        """Return a copy of the index probing n_probe lists, sharing its arrays."""
+        index = IVFNeighbours.from_state(self.get_state())
+        index.n_probe = int(n_probe)
+        return index
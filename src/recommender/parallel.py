@@ -0,0 +1,131 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+# Shared memory blocks attached by this process, kept open while in use
+_attached_blocks = []
+
+
+def default_n_jobs(n_tasks=None):
+    """Number of worker processes to use: one per core, at most one per task."""
+    n_jobs = os.cpu_count() or 1
+    return min(n_jobs, n_tasks) if n_tasks else n_jobs
+
+
+def _share_array(array, blocks):
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    blocks.append(block)
+    return {'name': block.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+
+def _attach_block(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    # Python < 3.13 registers attached blocks with the resource tracker, which
+    # would unlink them when this process exits; only the owner should do that
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _attach_array(handle):
+    block = _attach_block(handle['name'])
+    _attached_blocks.append(block)
+    return np.ndarray(handle['shape'], dtype=np.dtype(handle['dtype']), buffer=block.buf)
+
+
+def _share_value(value, blocks):
+    if hasattr(value, 'get_state'):
+        return {'model': _share_model(value, blocks)}
+    if issparse(value):
+        value = csr_matrix(value)
+        return {
+            'csr': [_share_array(getattr(value, part), blocks) for part in ('data', 'indices', 'indptr')],
+            'shape': value.shape
+        }
+    if isinstance(value, np.ndarray):
+        return {'array': _share_array(value, blocks)}
+    return {'value': value}
+
+
+def _attach_value(entry):
+    if 'model' in entry:
+        return attach_model(entry['model'])
+    if 'csr' in entry:
+        return csr_matrix(tuple(_attach_array(part) for part in entry['csr']), shape=entry['shape'], copy=False)
+    if 'array' in entry:
+        return _attach_array(entry['array'])
+    return entry['value']
+
+
+def _share_model(model, blocks):
+    state = {key: _share_value(value, blocks) for key, value in model.get_state().items()}
+    return {'class': type(model).__name__, 'state': state}
+
+
+class SharedModel:
+    """
+    A fitted model copied once into shared memory for worker processes.
+
+    The arrays from the model's get_state are placed in shared memory
+    blocks. handle is a small picklable description that workers pass to
+    attach_model to rebuild the model on top of the shared arrays without
+    copying them. Use as a context manager so the blocks are released.
+    """
+
+    def __init__(self, model):
+        self._blocks = []
+        try:
+            self.handle = _share_model(model, self._blocks)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Release and unlink the shared memory blocks."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_model(handle):
+    """Rebuild a model from a SharedModel handle, backed by the shared arrays."""
+    from src.recommender.persistence import model_class
+
+    state = {key: _attach_value(value) for key, value in handle['state'].items()}
+    return model_class(handle['class']).from_state(state)
+
+
+def process_pool(n_jobs, initializer=None, initargs=(), start_method=None):
+    """
+    Create a process pool, or return None when n_jobs is 1 and work should
+    run in the calling process. start_method picks how workers are started
+    (default: the platform's); the pool is also None if it is unavailable.
+    """
+    if n_jobs <= 1 or (start_method is not None and start_method not in multiprocessing.get_all_start_methods()):
+        return None
+    return ProcessPoolExecutor(
+        max_workers=n_jobs,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=initializer,
+        initargs=initargs
+    )
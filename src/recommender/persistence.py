@@ -0,0 +1,183 @@
+import os
+import json
+import shutil
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+# Bump when the on-disk layout changes in a way older loaders cannot read
+BUNDLE_FORMAT_VERSION = 2
+DEFAULT_BUNDLE_PATH = 'models/bundle'
+MANIFEST_FILE = 'manifest.json'
+
+
+def model_class(name):
+    """Look up a model class that can be rebuilt with from_state by name."""
+    from src.recommender import models, neighbours
+    classes = {
+        cls.__name__: cls for cls in (
+            models.CollaborativeFiltering, models.ItemBasedCF, models.MatrixFactorization,
+            models.ContentBasedFiltering, models.HybridRecommender,
+            neighbours.ExactNeighbours, neighbours.IVFNeighbours
+        )
+    }
+    if name not in classes:
+        raise ValueError(f"Unknown model class in bundle: {name}")
+    return classes[name]
+
+
+def _save_value(value, directory, prefix, saved):
+    """Write one state value and return its manifest entry."""
+    if hasattr(value, 'get_state'):
+        return {'model': _save_model(value, directory, prefix, saved)}
+
+    if issparse(value):
+        value = csr_matrix(value)
+        files = {}
+        for part in ('data', 'indices', 'indptr'):
+            files[part] = f'{prefix}.{part}.npy'
+            np.save(os.path.join(directory, files[part]), getattr(value, part))
+        return {'csr': files, 'shape': list(value.shape)}
+
+    if isinstance(value, np.ndarray):
+        filename = f'{prefix}.npy'
+        np.save(os.path.join(directory, filename), value)
+        return {'array': filename}
+
+    if isinstance(value, np.generic):
+        value = value.item()
+    return {'value': value}
+
+
+def _load_value(entry, directory, mmap_mode, loaded):
+    """Inverse of _save_value."""
+    if 'model' in entry:
+        return _load_model(entry['model'], directory, mmap_mode, loaded)
+
+    if 'csr' in entry:
+        parts = [
+            np.load(os.path.join(directory, entry['csr'][part]), mmap_mode=mmap_mode)
+            for part in ('data', 'indices', 'indptr')
+        ]
+        return csr_matrix(tuple(parts), shape=tuple(entry['shape']), copy=False)
+
+    if 'array' in entry:
+        return np.load(os.path.join(directory, entry['array']), mmap_mode=mmap_mode)
+
+    return entry['value']
+
+
+def _save_model(model, directory, prefix, saved):
+    # A model shared by several entries (e.g. the content model, which is
+    # also the hybrid's component) is written once and referenced after that
+    if id(model) in saved:
+        return {'ref': saved[id(model)]}
+    saved[id(model)] = prefix
+
+    state = {
+        key: _save_value(value, directory, f'{prefix}.{key}', saved)
+        for key, value in model.get_state().items()
+    }
+    return {'class': type(model).__name__, 'prefix': prefix, 'state': state}
+
+
+def _load_model(entry, directory, mmap_mode, loaded):
+    if 'ref' in entry:
+        return loaded[entry['ref']]
+
+    state = {
+        key: _load_value(value, directory, mmap_mode, loaded)
+        for key, value in entry['state'].items()
+    }
+    model = model_class(entry['class']).from_state(state)
+    loaded[entry['prefix']] = model
+    return model
+
+
+def save_bundle(models, path=DEFAULT_BUNDLE_PATH):
+    """
+    Save fitted models as a versioned bundle directory.
+
+    models maps a name (e.g. 'cf') to a fitted model. Each model's arrays are
+    written as raw .npy files next to a JSON manifest, so they can later be
+    memory-mapped instead of unpickled. A model object that appears more than
+    once, directly or as a component, is stored once. The bundle is written
+    to a temporary directory and swapped into place, so readers never see a
+    partial bundle.
+    Returns the manifest.
+    """
+    path = os.path.normpath(path)
+    parent = os.path.dirname(path) or '.'
+    os.makedirs(parent, exist_ok=True)
+
+    staging = f'{path}.tmp-{uuid.uuid4().hex[:8]}'
+    os.makedirs(staging)
+
+    created = datetime.now(timezone.utc)
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model_version': f"{created.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}",
+        'created': created.isoformat(),
+        'models': {}
+    }
+
+    try:
+        saved = {}
+        for name, model in models.items():
+            manifest['models'][name] = _save_model(model, staging, name, saved)
+
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Swap the new bundle into place
+        previous = None
+        if os.path.exists(path):
+            previous = f'{path}.old-{uuid.uuid4().hex[:8]}'
+            os.rename(path, previous)
+        os.rename(staging, path)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    return manifest
+
+
+def read_manifest(path=DEFAULT_BUNDLE_PATH):
+    """Read and validate a bundle manifest."""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model bundle format {manifest.get('format_version')} "
+            f"(expected {BUNDLE_FORMAT_VERSION}). Please retrain the models."
+        )
+
+    return manifest
+
+
+def load_bundle(path=DEFAULT_BUNDLE_PATH, mmap_mode='r'):
+    """
+    Load all models in a bundle.
+
+    Arrays are memory-mapped read-only by default, so loading is close to
+    instant and processes serving the same bundle share its pages through the
+    OS page cache. Pass mmap_mode=None to read everything into memory.
+    Returns (models, manifest).
+    """
+    manifest = read_manifest(path)
+    loaded = {}
+    models = {
+        name: _load_model(entry, path, mmap_mode, loaded)
+        for name, entry in manifest['models'].items()
+    }
+    return models, manifest
+
+
+def bundle_exists(path=DEFAULT_BUNDLE_PATH):
+    """Check whether a bundle has been saved at path."""
+    return os.path.exists(os.path.join(path, MANIFEST_FILE))
@@ -0,0 +1,142 @@
+import os
+import json
+import shutil
+import uuid
+
+import numpy as np
+
+from src.recommender.data import IdIndex
+from src.recommender.parallel import process_pool, default_n_jobs
+
+DEFAULT_PRECOMPUTED_PATH = 'models/precomputed'
+MANIFEST_FILE = 'manifest.json'
+
+# Models shared with worker processes; set by _init_worker
+_worker_models = None
+
+
+def _init_worker(models):
+    global _worker_models
+    _worker_models = models
+
+
+def _score_block(name, user_ids, n_recommendations):
+    return _worker_models[name].recommend_items_batch(user_ids, n_recommendations)
+
+
+def precompute_recommendations(models, user_ids, n_recommendations=10, block_size=1024, n_jobs=None):
+    """
+    Compute top-N recommendations for every user with every model.
+
+    models maps a name to a model with recommend_items_batch. Users are
+    scored in blocks of block_size, spread over n_jobs processes (all cores
+    by default). Returns {name: (ids, scores)} with (n_users x N) int32
+    movie IDs and float32 scores, in the order of user_ids.
+    """
+    user_ids = np.asarray(user_ids)
+    blocks = [user_ids[start:start + block_size] for start in range(0, len(user_ids), block_size)]
+    n_jobs = default_n_jobs(len(blocks)) if n_jobs is None else n_jobs
+
+    results = {}
+    # Workers are forked so they see the models without pickling them, and
+    # memory-mapped model arrays are shared with the parent through the page
+    # cache; without fork, blocks are scored in this process
+    pool = process_pool(n_jobs, _init_worker, (models,), start_method='fork')
+    try:
+        if pool is None:
+            _init_worker(models)
+        for name in models:
+            if pool is None:
+                outputs = [_score_block(name, block, n_recommendations) for block in blocks]
+            else:
+                outputs = list(pool.map(
+                    _score_block, [name] * len(blocks), blocks, [n_recommendations] * len(blocks)
+                ))
+
+            ids = np.concatenate([o[0] for o in outputs]) if outputs else np.empty((0, n_recommendations))
+            scores = np.concatenate([o[1] for o in outputs]) if outputs else np.empty((0, n_recommendations))
+            results[name] = (ids.astype(np.int32), scores.astype(np.float32))
+            print(f"Precomputed {ids.shape[1]} recommendations for {len(user_ids)} users with '{name}'")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return results
+
+
+def save_precomputed(results, user_ids, model_version, path=DEFAULT_PRECOMPUTED_PATH):
+    """
+    Save precomputed recommendations as fixed-width .npy arrays.
+
+    Row i of each array holds the recommendations for user_ids[i]. The
+    manifest records the model bundle version they were computed from.
+    """
+    path = os.path.normpath(path)
+    staging = f'{path}.tmp-{uuid.uuid4().hex[:8]}'
+    os.makedirs(staging)
+
+    manifest = {'model_version': model_version, 'models': {}}
+    np.save(os.path.join(staging, 'user_ids.npy'), np.asarray(user_ids, dtype=np.int32))
+    for name, (ids, scores) in results.items():
+        np.save(os.path.join(staging, f'{name}.ids.npy'), ids)
+        np.save(os.path.join(staging, f'{name}.scores.npy'), scores)
+        manifest['models'][name] = {'n_recommendations': int(ids.shape[1])}
+
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(staging, path)
+
+    return manifest
+
+
+class PrecomputedRecommendations:
+    """
+    Read-only, memory-mapped table of precomputed top-N recommendations.
+    """
+
+    def __init__(self, path=DEFAULT_PRECOMPUTED_PATH):
+        """Open the precomputed arrays at path."""
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.model_version = self.manifest['model_version']
+        self.users = IdIndex(np.load(os.path.join(path, 'user_ids.npy'), mmap_mode='r'))
+        self._tables = {
+            name: (
+                np.load(os.path.join(path, f'{name}.ids.npy'), mmap_mode='r'),
+                np.load(os.path.join(path, f'{name}.scores.npy'), mmap_mode='r')
+            )
+            for name in self.manifest['models']
+        }
+
+    @classmethod
+    def load(cls, path=DEFAULT_PRECOMPUTED_PATH, model_version=None):
+        """
+        Open precomputed recommendations if they exist and match model_version.
+
+        Returns None when there is nothing usable at path.
+        """
+        if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            return None
+        table = cls(path)
+        if model_version is not None and table.model_version != model_version:
+            print(f"Ignoring precomputed recommendations for model version {table.model_version}")
+            return None
+        return table
+
+    def lookup(self, name, user_id, n_recommendations):
+        """
+        Return the top n (ids, scores) for a user, or None if the user or
+        model is not in the table or fewer than n were precomputed.
+        """
+        if name not in self._tables:
+            return None
+        ids, scores = self._tables[name]
+        row = self.users.get(user_id)
+        if row < 0 or n_recommendations > ids.shape[1]:
+            return None
+
+        valid = ids[row, :n_recommendations] >= 0
+        return ids[row, :n_recommendations][valid], scores[row, :n_recommendations][valid]
@@ -0,0 +1,155 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Upper bound on the size of a dense score block in the batch functions
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def top_n(scores, n):
+    """
+    Return the indices of the n highest scores, best first.
+
+    Uses argpartition so only the selected n items are sorted.
+    """
+    n = min(int(n), scores.shape[0])
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if n < scores.shape[0]:
+        candidates = np.argpartition(-scores, n - 1)[:n]
+    else:
+        candidates = np.arange(scores.shape[0])
+
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def neighbour_scores_batch(ratings, neighbours, similarities):
+    """
+    Score every item for a block of users at once.
+
+    neighbours and similarities are (n_users x k) arrays. They are laid out
+    as a sparse (n_users x n_rows) weight matrix so the whole block is scored
+    with one sparse matrix product, returned as a dense array.
+    """
+    n_users, k = neighbours.shape
+    weights = csr_matrix(
+        (similarities.ravel(), neighbours.ravel(), np.arange(0, n_users * k + 1, k)),
+        shape=(n_users, ratings.shape[0])
+    )
+    return weights.dot(ratings).toarray()
+
+
+def mask_rated_batch(scores, rated):
+    """Exclude rated items, given as the CSR rows of the block's users."""
+    rows = np.repeat(np.arange(rated.shape[0]), np.diff(rated.indptr))
+    scores[rows, rated.indices] = -np.inf
+    return scores
+
+
+def top_n_batch(scores, n):
+    """
+    Return the column indices and values of the n highest scores per row.
+
+    Rows are ordered best first. As in top_n, only the selected columns are
+    sorted.
+    """
+    n = min(int(n), scores.shape[1])
+    if n <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+
+    if n < scores.shape[1]:
+        candidates = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def row_blocks(n_rows, n_columns, max_bytes=BLOCK_BYTES):
+    """
+    Yield (start, end) bounds of row blocks whose dense float64 score matrix
+    of width n_columns stays under max_bytes.
+    """
+    block_size = max(1, int(max_bytes // (8 * max(n_columns, 1))))
+    for start in range(0, n_rows, block_size):
+        yield start, min(start + block_size, n_rows)
+
+
+def top_k_similar(vectors, k, max_bytes=BLOCK_BYTES, rows=None):
+    """
+    Build a truncated top-k cosine neighbour table for the rows of a matrix.
+
+    vectors must be L2-normalised rows (sparse or dense). Similarities are
+    computed one block of rows at a time, so peak memory is bounded by
+    max_bytes however many rows there are. Each row's own entry is excluded.
+    rows limits the table to those rows (default: all).
+    Returns (n_rows x k) int32 neighbour indices and float32 similarities,
+    most similar first.
+    """
+    n_vectors = vectors.shape[0]
+    rows = np.arange(n_vectors) if rows is None else np.asarray(rows)
+    k = min(int(k), max(n_vectors - 1, 0))
+    vectors_t = vectors.T.tocsr() if hasattr(vectors, 'tocsr') else vectors.T
+
+    neighbours = np.zeros((len(rows), k), dtype=np.int32)
+    similarities = np.zeros((len(rows), k), dtype=np.float32)
+
+    for start, end in row_blocks(len(rows), n_vectors, max_bytes):
+        block_rows = rows[start:end]
+        block = vectors[block_rows].dot(vectors_t)
+        block = block.toarray() if hasattr(block, 'toarray') else np.asarray(block)
+        block = block.astype(np.float32, copy=False)
+        block[np.arange(end - start), block_rows] = -np.inf
+
+        neighbours[start:end], similarities[start:end] = top_n_batch(block, k)
+
+    return neighbours, similarities
+
+
+def refresh_top_k(vectors, neighbours, similarities, affected, search=None):
+    """
+    Bring a top-k neighbour table up to date after the vectors of the
+    affected rows changed or rows were added.
+
+    vectors are the current L2-normalised rows; neighbours and similarities
+    are the old table, which may have fewer rows, and affected is a boolean
+    mask over the current rows. Affected rows, and rows that had an affected
+    row as a neighbour, are searched again with search(rows), which returns
+    their (neighbours, similarities) (default: top_k_similar). Every other
+    row only compares against the affected rows, since its similarity to
+    all other rows is unchanged.
+    Returns the new (n_rows x k) neighbours and similarities.
+    """
+    n_rows = len(affected)
+    k = neighbours.shape[1]
+    if search is None:
+        search = lambda rows: top_k_similar(vectors, k, rows=rows)
+
+    new_neighbours = np.zeros((n_rows, k), dtype=np.int32)
+    new_similarities = np.zeros((n_rows, k), dtype=np.float32)
+    new_neighbours[:len(neighbours)] = neighbours
+    new_similarities[:len(similarities)] = similarities
+
+    stale = affected.copy()
+    stale[:len(neighbours)] |= affected[neighbours].any(axis=1)
+    stale_rows = np.flatnonzero(stale)
+    for start, end in row_blocks(len(stale_rows), n_rows):
+        block = stale_rows[start:end]
+        new_neighbours[block], new_similarities[block] = search(block)
+
+    affected_rows = np.flatnonzero(affected)
+    other_rows = np.flatnonzero(~stale)
+    affected_vectors_t = vectors[affected_rows].T.tocsr()
+    for start, end in row_blocks(len(other_rows), len(affected_rows) + k):
+        block = other_rows[start:end]
+        candidates = np.hstack([
+            new_neighbours[block], np.broadcast_to(affected_rows, (len(block), len(affected_rows)))
+        ])
+        scores = np.hstack([new_similarities[block], vectors[block].dot(affected_vectors_t).toarray()])
+        top, scores = top_n_batch(scores, k)
+        new_neighbours[block] = np.take_along_axis(candidates, top, axis=1)
+        new_similarities[block] = scores
+
+    return new_neighbours, new_similarities
@@ -0,0 +1,139 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+_NON_WORD = re.compile(r'[\W_]+')
+_YEAR_SUFFIX = re.compile(r'\s*\(\d{4}(?:-\d{4})?\)\s*$')
+
+
+def normalize_title(title):
+    """Case-fold a title and collapse runs of whitespace."""
+    return ' '.join(str(title).casefold().split())
+
+
+class TitleIndex:
+    """
+    Precomputed search index over movie titles.
+
+    Titles are indexed by their character bigrams and trigrams in an
+    inverted index, so a query only verifies the titles that contain all of
+    its n-grams instead of scanning the whole catalogue. Results are ranked
+    exact title matches first, then titles starting with the query, then
+    titles with a word starting with the query, then any other titles
+    containing it.
+    """
+
+    def __init__(self, movie_ids, titles):
+        """Build the index from parallel sequences of movie IDs and titles."""
+        self.movie_ids = np.asarray(movie_ids)
+        self.titles = [str(title) for title in titles]
+        self._normalized = [normalize_title(title) for title in self.titles]
+        self._words = [' ' + _NON_WORD.sub(' ', title) for title in self._normalized]
+
+        # Exact matches, with or without the trailing "(year)"
+        self._exact = defaultdict(list)
+        for position, title in enumerate(self._normalized):
+            self._exact[title].append(position)
+            bare = _YEAR_SUFFIX.sub('', title)
+            if bare != title:
+                self._exact[bare].append(position)
+
+        # Sorted titles for prefix range lookups
+        order = sorted(range(len(self._normalized)), key=self._normalized.__getitem__)
+        self._sorted_positions = order
+        self._sorted_titles = [self._normalized[position] for position in order]
+
+        # Inverted n-gram index; posting lists are sorted by position
+        postings = defaultdict(list)
+        for position, title in enumerate(self._normalized):
+            for gram in self._grams(title):
+                postings[gram].append(position)
+        self._postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+    @classmethod
+    def from_frame(cls, movies_df):
+        """Build the index from a DataFrame with movieId and title columns."""
+        return cls(movies_df['movieId'].values, movies_df['title'].values)
+
+    def __len__(self):
+        return len(self.titles)
+
+    @staticmethod
+    def _grams(text):
+        """All distinct bigrams and trigrams of a string."""
+        grams = set()
+        for size in (2, 3):
+            grams.update(text[i:i + size] for i in range(len(text) - size + 1))
+        return grams
+
+    def _candidates(self, query):
+        """Positions of titles containing every n-gram of the query, in catalogue order."""
+        size = 3 if len(query) >= 3 else 2
+        grams = {query[i:i + size] for i in range(len(query) - size + 1)}
+
+        lists = []
+        for gram in grams:
+            positions = self._postings.get(gram)
+            if positions is None:
+                return np.empty(0, dtype=np.int32)
+            lists.append(positions)
+
+        # Intersect starting from the shortest posting list
+        lists.sort(key=len)
+        candidates = lists[0]
+        for positions in lists[1:]:
+            candidates = np.intersect1d(candidates, positions, assume_unique=True)
+            if candidates.size == 0:
+                break
+        return candidates
+
+    def search(self, query, limit=10):
+        """
+        Return up to limit (movieId, title) matches for a query, best first.
+
+        Queries shorter than two characters return nothing.
+        """
+        query = normalize_title(query)
+        if len(query) < 2 or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+
+        def add(positions):
+            for position in positions:
+                if position not in seen:
+                    seen.add(position)
+                    results.append(position)
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        # 1. Exact title matches
+        if add(self._exact.get(query, ())):
+            return self._records(results)
+
+        # 2. Titles starting with the query
+        start = bisect_left(self._sorted_titles, query)
+        prefix_matches = []
+        for i in range(start, len(self._sorted_titles)):
+            if not self._sorted_titles[i].startswith(query) or len(prefix_matches) >= limit:
+                break
+            prefix_matches.append(self._sorted_positions[i])
+        if add(prefix_matches):
+            return self._records(results)
+
+        # 3. and 4. Word-prefix matches, then any substring match, taken from
+        # the titles containing all of the query's n-grams
+        candidates = self._candidates(query)
+        word_query = ' ' + _NON_WORD.sub(' ', query).strip()
+        if add(int(p) for p in candidates if word_query in self._words[p]):
+            return self._records(results)
+        add(int(p) for p in candidates if query in self._normalized[p])
+
+        return self._records(results)
+
+    def _records(self, positions):
+        return [{'movieId': int(self.movie_ids[p]), 'title': self.titles[p]} for p in positions]
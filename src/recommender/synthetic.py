@@ -0,0 +1,221 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Genre frequencies of the MovieLens catalogue
+GENRES = {
+    'Drama': 4361, 'Comedy': 3756, 'Thriller': 1894, 'Action': 1828, 'Romance': 1596,
+    'Adventure': 1263, 'Crime': 1199, 'Sci-Fi': 980, 'Horror': 978, 'Fantasy': 779,
+    'Children': 664, 'Animation': 611, 'Mystery': 573, 'Documentary': 440, 'War': 382,
+    'Musical': 334, 'Western': 167, 'IMAX': 158, 'Film-Noir': 87
+}
+NO_GENRES = '(no genres listed)'
+# Share of movies with 0, 1, 2, ... genres
+GENRE_COUNT_PROBABILITIES = [0.004, 0.29, 0.33, 0.24, 0.10, 0.027, 0.009]
+
+RATING_VALUES = np.arange(0.5, 5.01, 0.5)
+MEAN_RATING = 3.5
+MIN_USER_RATINGS = 20
+# Share of movie choices made uniformly instead of by popularity
+UNIFORM_SHARE = 0.2
+
+# MovieLens ratings span 1996 to 2018
+FIRST_TIMESTAMP = 820454400
+LAST_TIMESTAMP = 1537799250
+
+TITLE_WORDS = [
+    'The', 'Last', 'Night', 'Love', 'Man', 'Story', 'Dark', 'City', 'Life', 'Day', 'Dead', 'Girl',
+    'World', 'Time', 'House', 'Return', 'Secret', 'Blood', 'King', 'Star', 'War', 'Summer', 'Lost',
+    'Red', 'Black', 'Wild', 'Heart', 'Ghost', 'Island', 'River', 'Dream', 'Game', 'Shadow', 'Road',
+    'Fire', 'Moon', 'Silent', 'Golden', 'Broken', 'American', 'Little', 'Big', 'Great', 'Strange'
+]
+TAG_WORDS = [
+    'funny', 'atmospheric', 'classic', 'dark comedy', 'twist ending', 'visually appealing',
+    'based on a book', 'thought-provoking', 'sci-fi', 'predictable', 'great soundtrack', 'violence',
+    'quirky', 'boring', 'romance', 'cult film', 'surreal', 'inspirational', 'slow', 'overrated'
+]
+
+
+def default_scale(n_ratings):
+    """Number of users and movies for a dataset of n_ratings, in MovieLens proportions."""
+    n_users = max(10, int(n_ratings / 165))
+    n_movies = max(100, min(n_ratings // 10, int(12 * np.sqrt(n_ratings))))
+    return n_users, n_movies
+
+
+def _genre_masks(rng, n_movies):
+    """Draw each movie's genres as a bitmask over GENRES."""
+    names = list(GENRES)
+    weights = np.array(list(GENRES.values()), dtype=np.float64)
+    weights /= weights.sum()
+
+    counts = rng.choice(len(GENRE_COUNT_PROBABILITIES), n_movies,
+                        p=np.array(GENRE_COUNT_PROBABILITIES) / sum(GENRE_COUNT_PROBABILITIES))
+    # Weighted sampling without replacement: the genres with the largest
+    # exponential-race keys win
+    keys = rng.random((n_movies, len(names))) ** (1 / weights)
+    ranked = np.argsort(-keys, axis=1)
+    chosen = np.arange(len(names)) < counts[:, None]
+    masks = np.zeros(n_movies, dtype=np.int64)
+    for column in range(len(names)):
+        masks |= np.where(chosen[:, column], 1 << ranked[:, column], 0)
+    return masks
+
+
+def _genre_strings(masks):
+    names = list(GENRES)
+    strings = []
+    for mask in masks.tolist():
+        genres = [name for bit, name in enumerate(names) if mask >> bit & 1]
+        strings.append('|'.join(genres) if genres else NO_GENRES)
+    return strings
+
+
+def generate_movies(rng, n_movies):
+    """Return a movies DataFrame plus each movie's genre bitmask and popularity weight."""
+    # MovieLens IDs are sparse, so leave gaps
+    movie_ids = np.sort(rng.choice(2 * n_movies, n_movies, replace=False) + 1).astype(np.int32)
+
+    years = np.clip(np.round(2018 - rng.exponential(20, n_movies)), 1902, 2018).astype(int)
+    n_words = rng.integers(1, 5, n_movies)
+    words = rng.choice(TITLE_WORDS, (n_movies, 4))
+    titles = [
+        f"{' '.join(words[i, :n_words[i]])} ({years[i]})" for i in range(n_movies)
+    ]
+
+    masks = _genre_masks(rng, n_movies)
+    movies = pd.DataFrame({'movieId': movie_ids, 'title': titles, 'genres': _genre_strings(masks)})
+
+    # Zipf-like popularity, shuffled so it is unrelated to movieId
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 1.05
+    popularity = rng.permutation(popularity)
+    return movies, masks, popularity / popularity.sum()
+
+
+def user_activity(rng, n_users, n_ratings, n_movies):
+    """Power-law number of ratings per user, summing to about n_ratings."""
+    minimum = min(MIN_USER_RATINGS, max(1, n_ratings // n_users))
+    maximum = max(minimum, n_movies // 2)
+    weights = rng.pareto(1.2, n_users) + 1
+
+    # Scale the heavy tail until the capped counts add up to n_ratings
+    scale = (n_ratings - minimum * n_users) / weights.sum()
+    for _ in range(20):
+        counts = np.minimum(minimum + np.floor(scale * weights), maximum)
+        shortfall = n_ratings - counts.sum()
+        uncapped = weights[counts < maximum].sum()
+        if shortfall <= 0 or uncapped == 0:
+            break
+        scale += shortfall / uncapped
+    return counts.astype(np.int64)
+
+
+def _rating_chunk(rng, user_ids, counts, movie_ids, masks, cdf, item_bias, params):
+    """Generate the ratings of a block of users, sorted by user then movie."""
+    user_bias, favourite, start, duration = params
+    n_movies = len(movie_ids)
+
+    # Draw more movies than needed from the popularity distribution, mixed
+    # with a uniform share so heavy users reach the long tail, then keep
+    # each user's first `count` distinct movies
+    n_draws = np.minimum(counts * 3 + 10, 4 * n_movies)
+    users = np.repeat(np.arange(len(user_ids)), n_draws)
+    columns = np.where(
+        rng.random(len(users)) < UNIFORM_SHARE,
+        rng.integers(0, n_movies, len(users)),
+        np.minimum(np.searchsorted(cdf, rng.random(len(users))), n_movies - 1)
+    )
+    keys = users.astype(np.int64) * n_movies + columns
+    _, first = np.unique(keys, return_index=True)
+    first = np.sort(first)
+    users, columns = users[first], columns[first]
+    starts = np.r_[0, np.flatnonzero(users[1:] != users[:-1]) + 1]
+    ranks = np.arange(len(users)) - np.repeat(starts, np.diff(np.r_[starts, len(users)]))
+    keep = ranks < counts[users]
+    order = np.lexsort((movie_ids[columns[keep]], users[keep]))
+    users, columns = users[keep][order], columns[keep][order]
+
+    # Mean plus user and movie biases, a bonus for the user's favourite
+    # genre and noise, rounded to half stars
+    liked = (masks[columns] >> favourite[users]) & 1
+    scores = MEAN_RATING + user_bias[users] + item_bias[columns] + 0.6 * liked + rng.normal(0, 0.8, len(users))
+    ratings = np.clip(np.round(scores * 2) / 2, RATING_VALUES[0], RATING_VALUES[-1])
+
+    timestamps = start[users] + (rng.random(len(users)) * duration[users]).astype(np.int64)
+    return pd.DataFrame({
+        'userId': user_ids[users],
+        'movieId': movie_ids[columns],
+        'rating': ratings,
+        'timestamp': np.minimum(timestamps, LAST_TIMESTAMP)
+    })
+
+
+def generate_dataset(output_path, n_ratings=100_000, n_users=None, n_movies=None, tag_rate=0.036,
+                     seed=0, chunk_size=1_000_000, verbose=True):
+    """
+    Write a synthetic dataset in the MovieLens CSV format.
+
+    Creates ratings.csv, movies.csv and tags.csv in output_path with about
+    n_ratings ratings. User activity and movie popularity follow power laws,
+    genres follow the MovieLens genre mix, and each user favours a genre so
+    collaborative models have structure to learn. Users and movies default
+    to MovieLens proportions for the dataset size. Ratings are generated and
+    appended chunk_size at a time, so memory use does not grow with
+    n_ratings. The output is reproducible for a given seed.
+    Returns the number of ratings written.
+    """
+    rng = np.random.default_rng(seed)
+    default_users, default_movies = default_scale(n_ratings)
+    n_users = n_users or default_users
+    n_movies = n_movies or default_movies
+    os.makedirs(output_path, exist_ok=True)
+
+    movies, masks, popularity = generate_movies(rng, n_movies)
+    movies.to_csv(os.path.join(output_path, 'movies.csv'), index=False)
+    movie_ids = movies['movieId'].values
+    cdf = np.cumsum(popularity)
+    # Popular movies tend to be rated a little higher
+    item_bias = rng.normal(0, 0.4, n_movies) + 0.1 * np.log(popularity * n_movies)
+
+    counts = user_activity(rng, n_users, n_ratings, n_movies)
+    user_ids = np.arange(1, n_users + 1, dtype=np.int32)
+    genre_weights = np.array(list(GENRES.values()), dtype=np.float64)
+    params = (
+        rng.normal(0, 0.35, n_users),
+        rng.choice(len(GENRES), n_users, p=genre_weights / genre_weights.sum()),
+        rng.integers(FIRST_TIMESTAMP, LAST_TIMESTAMP, n_users),
+        rng.exponential(365 * 86400, n_users).astype(np.int64) + 3600
+    )
+
+    ratings_path = os.path.join(output_path, 'ratings.csv')
+    tags_path = os.path.join(output_path, 'tags.csv')
+    written = 0
+    first = 0
+    ends = np.cumsum(counts)
+    while first < n_users:
+        # Take as many whole users as fit in one chunk
+        last = max(first + 1, int(np.searchsorted(ends, (ends[first - 1] if first else 0) + chunk_size, side='right')))
+        block = slice(first, last)
+        chunk = _rating_chunk(
+            rng, user_ids[block], counts[block], movie_ids, masks, cdf, item_bias,
+            tuple(values[block] for values in params)
+        )
+        header = first == 0
+        chunk.to_csv(ratings_path, mode='w' if header else 'a', header=header, index=False, float_format='%.1f')
+
+        tagged = chunk[rng.random(len(chunk)) < tag_rate]
+        tags = pd.DataFrame({
+            'userId': tagged['userId'].values,
+            'movieId': tagged['movieId'].values,
+            'tag': rng.choice(TAG_WORDS, len(tagged)),
+            'timestamp': tagged['timestamp'].values
+        })
+        tags.to_csv(tags_path, mode='w' if header else 'a', header=header, index=False)
+
+        written += len(chunk)
+        first = last
+        if verbose:
+            print(f"Wrote {written:,} ratings for {first:,} of {n_users:,} users")
+
+    return written
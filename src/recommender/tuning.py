@@ -1,68 +1,207 @@
 import pandas as pd
 import numpy as np
-from src.recommender.models import CollaborativeFiltering, HybridRecommender
+from src.recommender.data import IdIndex
+from src.recommender.models import CollaborativeFiltering, ItemBasedCF, MatrixFactorization, HybridRecommender
 from src.recommender.evaluation import evaluate_recommendations
+from src.recommender.parallel import SharedModel, attach_model, process_pool, default_n_jobs
 
-def tune_collaborative_filtering(user_item_matrix, train_data, test_data, movies):
-    """Find optimal number of neighbors for collaborative filtering"""
+# Shared neighbour graph model and evaluation data in worker processes; set by _init_cf_worker
+_worker_state = None
+
+class _FixedRecommendations:
+    """
+    Serves recommendations computed ahead of time, so evaluate_recommendations
+    can score several configurations without recomputing shared work.
+    """
+
+    def __init__(self, user_ids, recommended_ids, recommended_scores):
+        self.users = IdIndex(np.asarray(user_ids))
+        self.recommended_ids = recommended_ids
+        self.recommended_scores = recommended_scores
+
+    def recommend_items_batch(self, user_ids, n_recommendations=5):
+        rows = self.users.positions(user_ids)
+        recommended_ids = self.recommended_ids[rows, :n_recommendations].copy()
+        recommended_scores = self.recommended_scores[rows, :n_recommendations].copy()
+        recommended_ids[rows < 0] = -1
+        recommended_scores[rows < 0] = 0
+        return recommended_ids, recommended_scores
+
+def _init_cf_worker(model_handle, test_data, movies):
+    global _worker_state
+    _worker_state = (attach_model(model_handle), test_data, movies)
+
+def _evaluate_k(k):
+    """Evaluate CF with the first k columns of the shared neighbour graph."""
+    model, test_data, movies = _worker_state
+    neighbours, similarities = model._neighbour_graph
+    model = model.with_neighbour_graph(neighbours[:, :k], similarities[:, :k])
+    return evaluate_recommendations(model, test_data, movies, k=10, verbose=False)
+
+def tune_collaborative_filtering(user_item_matrix, train_data, test_data, movies, n_jobs=None):
+    """
+    Find optimal number of neighbors for collaborative filtering.
+
+    The model is fitted and the neighbour graph computed once at the largest
+    k; smaller k values read the first k neighbours from it. Values of k are
+    evaluated on n_jobs processes (all cores by default) that share the
+    fitted model through shared memory.
+    """
     print("Tuning collaborative filtering parameters...")
     k_values = [5, 10, 15, 20, 30, 50]
     results = []
-    
+
+    model = CollaborativeFiltering(k=max(k_values))
+    model.fit(user_item_matrix)
+    model = model.with_neighbour_graph(*model.compute_neighbour_graph())
+
+    n_jobs = default_n_jobs(len(k_values)) if n_jobs is None else n_jobs
+    with SharedModel(model) as shared:
+        pool = process_pool(n_jobs, _init_cf_worker, (shared.handle, test_data, movies))
+        try:
+            if pool is None:
+                _init_cf_worker(shared.handle, test_data, movies)
+                scores = map(_evaluate_k, k_values)
+            else:
+                print(f"Testing k={k_values} on {n_jobs} processes...")
+                scores = pool.map(_evaluate_k, k_values)
+
+            for k, (precision, recall, hit_rate) in zip(k_values, scores):
+                results.append({
+                    'k': k,
+                    'precision': precision,
+                    'recall': recall,
+                    'hit_rate': hit_rate
+                })
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    results_df = pd.DataFrame(results)
+    print("\nCollaborative filtering tuning results:")
+    print(results_df)
+
+    best_k = results_df.loc[results_df['hit_rate'].idxmax()]['k']
+    print(f"Best k value: {best_k}")
+
+    # Return as an integer to avoid issues
+    return int(best_k)
+
+def tune_item_based_cf(user_item_matrix, train_data, test_data, movies):
+    """
+    Find the optimal number of similar items kept per item for item-based
+    collaborative filtering.
+
+    The item-item table is computed once at the largest k; smaller k values
+    keep the first k columns of each item's sorted neighbour list.
+    """
+    print("Tuning item-based collaborative filtering parameters...")
+    k_values = [10, 20, 50, 100]
+    results = []
+
+    model = ItemBasedCF(k=max(k_values))
+    model.fit(user_item_matrix)
+
     for k in k_values:
-        print(f"Testing with k={k}...")
-        # Ensure k is an integer
-        model = CollaborativeFiltering(k=int(k))
-        model.fit(user_item_matrix)
-        
+        print(f"Testing k={k}...")
         precision, recall, hit_rate = evaluate_recommendations(
-            model, test_data, movies, k=10, verbose=False
+            model.with_k(k), test_data, movies, k=10, verbose=False
         )
-        
         results.append({
             'k': k,
             'precision': precision,
             'recall': recall,
             'hit_rate': hit_rate
         })
-    
+
     results_df = pd.DataFrame(results)
-    print("\nCollaborative filtering tuning results:")
+    print("\nItem-based collaborative filtering tuning results:")
     print(results_df)
-    
+
     best_k = results_df.loc[results_df['hit_rate'].idxmax()]['k']
     print(f"Best k value: {best_k}")
-    
-    # Return as an integer to avoid issues
+
     return int(best_k)
 
-def tune_hybrid_weights(user_item_matrix, movie_features, train_data, test_data, movies):
-    """Find optimal weighting between collaborative and content-based"""
+def tune_matrix_factorization(user_item_matrix, train_data, test_data, movies):
+    """
+    Find the optimal number of latent factors and regularization for the
+    ALS matrix factorization model.
+
+    Each configuration is fitted separately; training already uses every
+    core, so configurations are evaluated one after another.
+    Returns (factors, regularization).
+    """
+    print("Tuning matrix factorization parameters...")
+    factor_values = [16, 32, 64]
+    regularization_values = [0.1, 1.0, 10.0]
+    results = []
+
+    for factors in factor_values:
+        for regularization in regularization_values:
+            print(f"Testing factors={factors}, regularization={regularization}...")
+            model = MatrixFactorization(factors=factors, regularization=regularization)
+            model.fit(user_item_matrix)
+            precision, recall, hit_rate = evaluate_recommendations(
+                model, test_data, movies, k=10, verbose=False
+            )
+            results.append({
+                'factors': factors,
+                'regularization': regularization,
+                'precision': precision,
+                'recall': recall,
+                'hit_rate': hit_rate
+            })
+
+    results_df = pd.DataFrame(results)
+    print("\nMatrix factorization tuning results:")
+    print(results_df)
+
+    best = results_df.loc[results_df['hit_rate'].idxmax()]
+    print(f"Best factors: {int(best['factors'])}, regularization: {best['regularization']}")
+
+    return int(best['factors']), float(best['regularization'])
+
+def tune_hybrid_weights(user_item_matrix, movie_features, train_data, test_data, movies, cf_model=None):
+    """
+    Find optimal weighting between collaborative and content-based.
+
+    The hybrid model is fitted once and both components score each test
+    user once; each weight only re-blends those scores. cf_model is an
+    unfitted collaborative component (default: the hybrid's own).
+    """
     print("Tuning hybrid recommender weights...")
     weights = [0.3, 0.5, 0.7, 0.9]
+    n_recommendations = 10
     results = []
-    
-    for weight in weights:
+
+    model = HybridRecommender(cf_model=cf_model)
+    model.fit(user_item_matrix, movie_features, movies, train_data)
+
+    test_users = test_data['userId'].unique()
+    # Both components score each user once; every weight reuses the scores
+    recommendations = model.recommend_items_for_weights(test_users, n_recommendations, weights)
+
+    for weight, (recommended_ids, recommended_scores) in zip(weights, recommendations):
         print(f"Testing with cf_weight={weight}...")
-        model = HybridRecommender(cf_weight=weight)
-        model.fit(user_item_matrix, movie_features, movies, train_data)
-        
+        fixed = _FixedRecommendations(test_users, recommended_ids, recommended_scores)
+
         precision, recall, hit_rate = evaluate_recommendations(
-            model, test_data, movies, k=10, verbose=False
+            fixed, test_data, movies, k=n_recommendations, verbose=False
         )
-        
+
         results.append({
             'cf_weight': weight,
             'precision': precision,
             'recall': recall,
             'hit_rate': hit_rate
         })
-    
+
     results_df = pd.DataFrame(results)
     print("\nHybrid recommender tuning results:")
     print(results_df)
-    
+
     best_weight = results_df.loc[results_df['hit_rate'].idxmax()]['cf_weight']
     print(f"Best collaborative filtering weight: {best_weight}")
-    
+
     return best_weight
@@ -1,6 +1,5 @@
 import os
 import logging
-import pickle
 import shutil
 import requests
 import zipfile
@@ -25,28 +24,6 @@ def setup_logging(log_file='logs/recommendation_system.log'):
     
     return logging.getLogger('recommendation_system')
 
-def save_model(model, filename):
-    """Save model to file."""
-    # Ensure models directory exists
-    model_dir = os.path.dirname(filename)
-    if not os.path.exists(model_dir):
-        os.makedirs(model_dir)
-    
-    with open(filename, 'wb') as f:
-        pickle.dump(model, f)
-    
-    return os.path.exists(filename)
-
-def load_model(filename):
-    """Load model from file."""
-    if not os.path.exists(filename):
-        return None
-    
-    with open(filename, 'rb') as f:
-        model = pickle.load(f)
-    
-    return model
-
 def clean_cache_files():
     """Clean temporary cache files."""
     # Remove __pycache__ directories
@@ -1,34 +1,100 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-import pandas as pd
-import pickle
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response
+import numpy as np
 import os
 import json
 import sys
+import time
+from src.recommender.persistence import load_bundle, bundle_exists, DEFAULT_BUNDLE_PATH
+from src.recommender.precompute import PrecomputedRecommendations, DEFAULT_PRECOMPUTED_PATH
+from src.recommender.search import TitleIndex
+from src.recommender.data import load_movies
+from src.recommender.metrics import REGISTRY, span
+from web.cache import ResponseCache
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
+# MovieLens ratings range from half a star to five stars
+MIN_RATING = 0.5
+MAX_RATING = 5.0
+
 # Load models and data when app starts
 cf_model = None
 hybrid_model = None
+cb_model = None
 movies_df = None
+movie_titles = None
+title_index = None
+precomputed = None
+model_version = None
+
+# Cache of recommendation responses, keyed by endpoint, ID, n and model version
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('RECOMMENDATION_CACHE_TTL', 600))
+)
+
+REGISTRY.describe('http_requests_total', 'HTTP requests by endpoint, method and status.')
+REGISTRY.describe('http_request_duration_seconds', 'HTTP request latency by endpoint.')
+REGISTRY.describe('model_seconds', 'Time to produce recommendations by model and source.')
+REGISTRY.describe('span_seconds', 'Time spent in instrumented code paths.')
+
+
+CACHE_COUNTERS = ('hits', 'misses', 'evictions', 'expirations')
+
+
+def cache_counters():
+    stats = response_cache.stats()
+    return [('response_cache_' + name + '_total', {}, stats[name]) for name in CACHE_COUNTERS]
+
+
+def cache_gauges():
+    stats = response_cache.stats()
+    return [('response_cache_' + name, {}, stats[name]) for name in ('size', 'hit_ratio')]
+
+REGISTRY.add_counters(cache_counters)
+REGISTRY.add_gauges(cache_gauges)
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unknown'
+        REGISTRY.observe('http_request_duration_seconds', time.perf_counter() - start, endpoint=endpoint)
+        REGISTRY.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
 
 def load_models():
-    global cf_model, hybrid_model, movies_df
+    global cf_model, hybrid_model, cb_model, movies_df, movie_titles, title_index, precomputed, model_version
     try:
         # Ensure the models directory exists
         os.makedirs('models', exist_ok=True)
         
-        if not os.path.exists('models/cf_model.pkl') or not os.path.exists('models/hybrid_model.pkl'):
+        if not bundle_exists(DEFAULT_BUNDLE_PATH):
             print("Model files don't exist. Please run 'python -m scripts.train' first")
             return False
-            
-        with open('models/cf_model.pkl', 'rb') as f:
-            cf_model = pickle.load(f)
-        with open('models/hybrid_model.pkl', 'rb') as f:
-            hybrid_model = pickle.load(f)
+        
+        # Model arrays are memory-mapped, not copied into this process
+        with span('model_load'):
+            models, manifest = load_bundle(DEFAULT_BUNDLE_PATH)
+        cf_model = models['cf']
+        hybrid_model = models['hybrid']
+        cb_model = models['content']
+        model_version = manifest['model_version']
+        response_cache.clear()
+        
+        # Offline top-N lists, only used if computed from this bundle
+        precomputed = PrecomputedRecommendations.load(DEFAULT_PRECOMPUTED_PATH, model_version)
             
         # Load movies data
-        movies_df = pd.read_csv('data/ml-latest-small/movies.csv')
+        movies_df = load_movies()
+        movie_titles = dict(zip(movies_df['movieId'].tolist(), movies_df['title'].tolist()))
+        title_index = TitleIndex.from_frame(movies_df)
         print("Models and data loaded successfully")
         return True
     except Exception as e:
@@ -58,20 +124,111 @@ def api_search():
     if movies_df is None:
         load_models()
         
-    query = request.args.get('q', '').lower()
+    query = request.args.get('q', '')
     if not query or len(query) < 2:
         return jsonify([])
     
-    # Filter movies by title
-    mask = movies_df['title'].str.lower().str.contains(query)
-    results = movies_df[mask].head(10)[['movieId', 'title']].to_dict('records')
+    # Look up matching titles in the precomputed index
+    results = title_index.search(query, limit=10)
     return jsonify(results)
 
 
+def movie_records(movie_ids, scores, score_key):
+    """Turn recommendation arrays into JSON records with titles, skipping unknown movies."""
+    return [
+        {'movieId': int(movie_id), 'title': movie_titles[movie_id], score_key: float(score)}
+        for movie_id, score in zip(movie_ids.tolist(), scores.tolist())
+        if movie_id in movie_titles
+    ]
+
+
+def user_recommendations(user_id, n):
+    """Collaborative and hybrid recommendations for a user, cached per model version."""
+    key = ('user', user_id, n, model_version)
+    results = response_cache.get(key)
+    if results is not None:
+        return results
+    
+    results = {}
+    for section, name, model in (('collaborative', 'cf', cf_model), ('hybrid', 'hybrid', hybrid_model)):
+        # Known users are served from the precomputed table, others scored live
+        start = time.perf_counter()
+        found = precomputed.lookup(name, user_id, n) if precomputed is not None else None
+        if found is not None:
+            records = movie_records(found[0], found[1], 'score')
+        else:
+            recs = model.recommend_items(user_id, n_recommendations=n)
+            records = movie_records(recs['movieId'].values, recs['score'].values, 'score') if not recs.empty else []
+        REGISTRY.observe('model_seconds', time.perf_counter() - start, model=name,
+                         source='precomputed' if found is not None else 'live')
+        if records:
+            results[section] = records
+    
+    response_cache.set(key, results)
+    return results
+
+
+def parse_ratings(value):
+    """Turn a JSON list of [movieId, rating] pairs or {movieId, rating} objects into (int, float) pairs."""
+    if not isinstance(value, list):
+        raise ValueError("ratings must be a list of [movieId, rating] pairs")
+    pairs = []
+    for item in value:
+        if isinstance(item, dict):
+            item = (item.get('movieId'), item.get('rating'))
+        if not isinstance(item, (list, tuple)) or len(item) != 2:
+            raise ValueError("ratings must be a list of [movieId, rating] pairs")
+        try:
+            movie_id, rating = int(item[0]), float(item[1])
+        except (TypeError, ValueError):
+            raise ValueError("Each rating needs an integer movieId and a numeric rating")
+        if not np.isfinite(rating) or not MIN_RATING <= rating <= MAX_RATING:
+            raise ValueError(f"Each rating must be between {MIN_RATING} and {MAX_RATING}")
+        pairs.append((movie_id, rating))
+    return pairs
+
+
+def session_recommendations(ratings, n):
+    """Collaborative and hybrid recommendations folded in from a new user's ratings, not cached."""
+    results = {}
+    for section, name, model in (('collaborative', 'cf', cf_model), ('hybrid', 'hybrid', hybrid_model)):
+        start = time.perf_counter()
+        recs = model.recommend_for_ratings(ratings, n_recommendations=n)
+        records = movie_records(recs['movieId'].values, recs['score'].values, 'score') if not recs.empty else []
+        REGISTRY.observe('model_seconds', time.perf_counter() - start, model=name, source='session')
+        if records:
+            results[section] = records
+    return results
+
+
+def similar_movie_recommendations(movie_id, n):
+    """
+    Content-based similar movies for a movie, cached per model version. n is
+    capped at the size of the model's neighbour table.
+    """
+    n = min(n, cb_model.neighbor_indices.shape[1])
+    key = ('movie', movie_id, n, model_version)
+    results = response_cache.get(key)
+    if results is not None:
+        return results
+    
+    results = {}
+    start = time.perf_counter()
+    similar_movies = cb_model.recommend_similar_movies(movie_id, n_recommendations=n)
+    if not similar_movies.empty:
+        with span('dataframe_merge'):
+            similar_movies = similar_movies.merge(movies_df[['movieId', 'title']], on='movieId')
+            results['similar_movies'] = similar_movies[['movieId', 'title', 'similarity']].to_dict('records')
+    REGISTRY.observe('model_seconds', time.perf_counter() - start, model='content', source='live')
+    
+    response_cache.set(key, results)
+    return results
+
+
 @app.route('/api/recommend', methods=['POST'])
 def api_recommend():
     # Ensure models are loaded
-    if cf_model is None or hybrid_model is None:
+    if cf_model is None or hybrid_model is None or cb_model is None:
         if not load_models():
             return jsonify({"error": "Models not loaded. Run 'python -m scripts.train' first"}), 500
     
@@ -79,9 +236,15 @@ def api_recommend():
         data = request.json
         user_id = data.get('userId')
         movie_id = data.get('movieId')
+        ratings = data.get('ratings')
+        
+        if not user_id and not movie_id and not ratings:
+            return jsonify({"error": "Please provide userId, movieId or ratings"}), 400
         
-        if not user_id and not movie_id:
-            return jsonify({"error": "Please provide either userId or movieId"}), 400
+        try:
+            n = min(max(int(data.get('n', 10)), 1), 100)
+        except (TypeError, ValueError):
+            return jsonify({"error": "n must be a valid integer"}), 400
         
         results = {}
         
@@ -89,45 +252,57 @@ def api_recommend():
         if user_id:
             try:
                 user_id = int(user_id)
-                cf_recs = cf_model.recommend_items(user_id, n_recommendations=10)
-                if not cf_recs.empty:
-                    cf_recs = cf_recs.merge(movies_df[['movieId', 'title']], on='movieId')
-                    results['collaborative'] = cf_recs[['movieId', 'title', 'score']].to_dict('records')
-                
-                hybrid_recs = hybrid_model.recommend_items(user_id, n_recommendations=10)
-                if not hybrid_recs.empty:
-                    hybrid_recs = hybrid_recs.merge(movies_df[['movieId', 'title']], on='movieId')
-                    results['hybrid'] = hybrid_recs[['movieId', 'title', 'score']].to_dict('records')
             except ValueError:
                 return jsonify({"error": "User ID must be a valid integer"}), 400
         
+        # Users not in the training data can send the ratings they have
+        # given so far, which are folded in without retraining
+        if ratings and (not user_id or user_id not in cf_model.user_index):
+            try:
+                ratings = parse_ratings(ratings)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            results.update(session_recommendations(ratings, n))
+        elif user_id:
+            results.update(user_recommendations(user_id, n))
+        
         # Movie-based recommendations
         if movie_id:
             try:
                 movie_id = int(movie_id)
-                from src.recommender.models import ContentBasedFiltering
-                cb_model = ContentBasedFiltering()
-                cb_model.fit(get_movie_features(movies_df), movies_df)
-                
-                similar_movies = cb_model.recommend_similar_movies(movie_id, n_recommendations=10)
-                if not similar_movies.empty:
-                    similar_movies = similar_movies.merge(movies_df[['movieId', 'title']], on='movieId')
-                    results['similar_movies'] = similar_movies[['movieId', 'title', 'similarity']].to_dict('records')
             except ValueError:
                 return jsonify({"error": "Movie ID must be a valid integer"}), 400
+            results.update(similar_movie_recommendations(movie_id, n))
         
         if not results:
             return jsonify({"message": "No recommendations found"}), 404
-            
-        return jsonify(results)
+        
+        with span('json_serialization'):
+            return jsonify(results)
     except Exception as e:
         app.logger.error(f"Error in recommendations: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-# Helper function
-def get_movie_features(movies):
-    from src.recommender.data import get_movie_features
-    return get_movie_features(movies)
+
+@app.route('/api/cache')
+def api_cache():
+    return jsonify({'model_version': model_version, **response_cache.stats()})
+
+@app.route('/healthz')
+def healthz():
+    """Liveness check: the process is up and serving requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness check: models are loaded and recommendations can be served."""
+    ready = cf_model is not None and hybrid_model is not None and cb_model is not None and title_index is not None
+    body = {'ready': ready, 'model_version': model_version, 'pid': os.getpid()}
+    return jsonify(body), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/favicon.ico')
 def favicon():
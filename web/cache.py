@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Bounded in-process cache for API responses.
+
+    Entries are evicted least recently used first once maxsize is reached,
+    and expire ttl seconds after they were stored. Callers include the model
+    version in their keys, and the cache is cleared whenever a new model
+    bundle is loaded, so stale recommendations are never served.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        """Initialize with a maximum number of entries and a TTL in seconds (None for no expiry)."""
+        self.maxsize = int(maxsize)
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and self._clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full."""
+        if self.maxsize <= 0:
+            return
+
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries, e.g. after a new model bundle has been loaded."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the entry count and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,180 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from web import app as web_app
+
+# Seconds a worker may take to finish its current request when stopping
+GRACEFUL_TIMEOUT = 30
+
+
+def _serve(listener):
+    """Worker process: serve requests on the inherited socket until told to stop."""
+    server = make_server('', 0, web_app.app, fd=listener.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever to return, so it cannot run in
+        # the signal handler on the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    server.serve_forever()
+    os._exit(0)
+
+
+class PreforkServer:
+    """
+    Pre-fork server for the web app.
+
+    The parent loads the model bundle, title index and precomputed tables
+    once and then forks the workers, which share those read-only pages
+    copy-on-write (model arrays are memory-mapped, so they are shared
+    through the page cache as well). Workers accept connections from one
+    shared listening socket and each serve one request at a time.
+
+    The parent restarts workers that die. SIGHUP reloads the models in the
+    parent and replaces the workers one at a time, so the port keeps being
+    served. SIGTERM or SIGINT stop the workers after their current request.
+    Response caches and /metrics counters are per worker.
+    """
+
+    def __init__(self, host='0.0.0.0', port=8080, workers=2):
+        self.host = host
+        self.port = port
+        self.n_workers = workers
+        self.workers = set()
+        self.listener = None
+        self._reload = False
+        self._stopping = False
+
+    def _load(self):
+        if not web_app.load_models():
+            return False
+        # Move everything loaded so far out of the garbage collector's view,
+        # so collections in the workers do not touch (and copy) its pages
+        gc.collect()
+        gc.freeze()
+        return True
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _serve(self.listener)
+            finally:
+                os._exit(1)
+        self.workers.add(pid)
+        return pid
+
+    def _stop_worker(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        try:
+            while time.monotonic() < deadline:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    break
+                time.sleep(0.05)
+            else:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+        self.workers.discard(pid)
+
+    def _reap(self):
+        """Collect exited workers; returns how many died."""
+        died = 0
+        while self.workers:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.workers:
+                self.workers.discard(pid)
+                died += 1
+        return died
+
+    def _restart_workers(self):
+        """Reload the models and replace every worker, one at a time."""
+        print("Reloading models and restarting workers...")
+        gc.unfreeze()
+        if not self._load():
+            print("Reload failed; keeping the current workers")
+            return
+        for pid in list(self.workers):
+            self._spawn()
+            self._stop_worker(pid)
+        print(f"Restarted {self.n_workers} workers")
+
+    def run(self):
+        if not self._load():
+            return 1
+
+        self.listener = socket.create_server((self.host, self.port), backlog=128)
+        self.listener.set_inheritable(True)
+
+        def reload(signum, frame):
+            self._reload = True
+
+        def stop(signum, frame):
+            self._stopping = True
+
+        signal.signal(signal.SIGHUP, reload)
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        for _ in range(self.n_workers):
+            self._spawn()
+        print(f"Serving on http://{self.host}:{self.port} with {self.n_workers} workers (parent pid {os.getpid()})")
+
+        try:
+            while not self._stopping:
+                if self._reload:
+                    self._reload = False
+                    self._restart_workers()
+                died = self._reap()
+                if died and not self._stopping:
+                    print(f"Restarting {died} worker(s) that exited")
+                    for _ in range(died):
+                        self._spawn()
+                time.sleep(0.2)
+        finally:
+            print("Stopping workers...")
+            for pid in list(self.workers):
+                self._stop_worker(pid)
+            self.listener.close()
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the web app from several pre-forked worker processes')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8080)), help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("Pre-fork serving needs os.fork; starting a single threaded server instead")
+        web_app.load_models()
+        web_app.app.run(host=args.host, port=args.port, threaded=True)
+        return 0
+
+    return PreforkServer(args.host, args.port, args.workers).run()
+
+if __name__ == '__main__':
+    sys.exit(main())